@@ -0,0 +1,106 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import tracemalloc
+
+from benchmarks.fakes import FakeBot
+from benchmarks.scenarios import SCENARIOS, Recorder
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_scenario(name, scale, trace_memory):
+    recorder = Recorder()
+    with tempfile.TemporaryDirectory() as directory:
+        bot = FakeBot(directory)
+        if trace_memory:
+            tracemalloc.start()
+        try:
+            await SCENARIOS[name](bot, scale, recorder)
+            peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        finally:
+            if trace_memory:
+                tracemalloc.stop()
+            await bot.close()
+
+    return {
+        "ops": recorder.ops,
+        "throughput": recorder.ops / recorder.elapsed if recorder.elapsed else 0.0,
+        "p50_us": percentile(recorder.samples, 0.5) * 1e6,
+        "p99_us": percentile(recorder.samples, 0.99) * 1e6,
+        "peak_mib": peak / 1024 / 1024 if peak is not None else None,
+    }
+
+
+def compare(result, baseline, tolerance):
+    # Throughput dropping or p99 rising by more than the tolerance counts as a regression
+    if baseline is None:
+        return "", False
+    change = result["throughput"] / baseline["throughput"] - 1 if baseline["throughput"] else 0.0
+    p99_change = result["p99_us"] / baseline["p99_us"] - 1 if baseline["p99_us"] else 0.0
+    regressed = change < -tolerance or p99_change > tolerance
+    return f"{change:+.0%} ops/s, {p99_change:+.0%} p99{'  REGRESSED' if regressed else ''}", regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cogs' hot paths offline with fake Discord objects")
+    parser.add_argument("scenarios", nargs="*", help=f"Scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier for dataset sizes and op counts")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--no-memory", action="store_true",
+                        help="Skip tracemalloc, which slows every scenario down; timings then aren't comparable "
+                             "with a baseline that traced memory")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+    logging.basicConfig(level=logging.WARNING)
+    random.seed(args.seed)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    settings = {"scale": args.scale, "trace_memory": not args.no_memory}
+    if baseline and baseline.get("settings") != settings:
+        print(f"Baseline was recorded with {baseline.get('settings')}, not comparing")
+        baseline = {}
+
+    results = {}
+    any_regressed = False
+    print(f"{'scenario':<24}{'ops':>9}{'ops/s':>12}{'p50 µs':>10}{'p99 µs':>10}{'peak MiB':>10}  vs baseline")
+    for name in args.scenarios or SCENARIOS:
+        result = asyncio.run(run_scenario(name, args.scale, not args.no_memory))
+        results[name] = result
+        summary, regressed = compare(result, baseline.get("results", {}).get(name), args.tolerance)
+        any_regressed |= regressed
+        peak = f"{result['peak_mib']:.1f}" if result["peak_mib"] is not None else "-"
+        print(f"{name:<24}{result['ops']:>9}{result['throughput']:>12.0f}{result['p50_us']:>10.1f}"
+              f"{result['p99_us']:>10.1f}{peak:>10}  {summary}")
+
+    if args.save_baseline:
+        previous = baseline.get("results", {})
+        with open(args.baseline, "w") as f:
+            json.dump({"settings": settings, "python": platform.python_version(),
+                       "results": {**previous, **results}}, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    sys.exit(1 if any_regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import itertools
+import os
+
+import discord
+
+from utils.outbound import OutboundDispatcher
+from utils.persistence import WriteBehind
+from utils.storage import SQLiteStorage
+
+ids = itertools.count(10 ** 17)
+
+
+class FakeUser:
+    def __init__(self, user_id=None, name="user"):
+        self.id = user_id or next(ids)
+        self.name = name
+        self.display_name = name
+        self.mention = f"<@{self.id}>"
+        self.bot = False
+        self.avatar = None
+        self.sent = 0
+
+    async def send(self, *args, **kwargs):
+        self.sent += 1
+        return FakeMessage(author=self)
+
+
+class FakeChannel:
+    def __init__(self, channel_id=None):
+        self.id = channel_id or next(ids)
+        self.sent = 0
+
+    async def send(self, *args, **kwargs):
+        self.sent += 1
+        return FakeMessage(channel=self)
+
+
+class FakeMessage:
+    def __init__(self, author=None, channel=None, content="", embeds=()):
+        self.id = next(ids)
+        self.author = author or FakeUser()
+        self.channel = channel or FakeChannel()
+        self.content = content
+        self.embeds = list(embeds)
+        self.edits = 0
+
+    async def edit(self, **kwargs):
+        self.edits += 1
+        if kwargs.get("embed") is not None:
+            self.embeds = [kwargs["embed"]]
+        return self
+
+
+class FakeResponse:
+    # Enough of discord.InteractionResponse for the cogs: records what was sent instead of calling Discord
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.sent = []
+        self.acked = False
+
+    def is_done(self):
+        return self.acked
+
+    async def ack(self, kind, args, kwargs):
+        if self.acked:
+            raise discord.InteractionResponded(self.interaction)
+        self.acked = True
+        self.sent.append((kind, args, kwargs))
+
+    async def send_message(self, *args, **kwargs):
+        await self.ack("send_message", args, kwargs)
+
+    async def edit_message(self, *args, **kwargs):
+        await self.ack("edit_message", args, kwargs)
+        if kwargs.get("embed") is not None and self.interaction.message is not None:
+            self.interaction.message.embeds = [kwargs["embed"]]
+
+    async def send_modal(self, modal):
+        await self.ack("send_modal", (modal,), {})
+
+    async def defer(self, **kwargs):
+        await self.ack("defer", (), kwargs)
+
+
+class FakeFollowup:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, *args, **kwargs):
+        self.sent.append((args, kwargs))
+        return FakeMessage()
+
+
+class FakeInteraction:
+    def __init__(self, client, user=None, guild_id=None, message=None, command=None):
+        self.id = next(ids)
+        self.client = client
+        self.user = user or FakeUser()
+        self.guild_id = guild_id
+        self.channel_id = message.channel.id if message else None
+        self.message = message
+        self.command = command
+        self.data = {}
+        self.extras = {}
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup()
+        self.original = FakeMessage(author=self.user)
+
+    async def original_response(self):
+        return self.original
+
+
+class FakeChoice:
+    def __init__(self, value):
+        self.name = value
+        self.value = value
+
+
+class FakeBot:
+    # The attributes main.Client gives the cogs, backed by the real storage, write-behind and outbound layers
+    def __init__(self, directory, tenor_base_url="http://127.0.0.1:8081/v2"):
+        self.storage = SQLiteStorage(os.path.join(directory, "bench.db"))
+        self.persistence = WriteBehind(self.storage)
+        self.outbound = OutboundDispatcher(global_rate=10 ** 6, route_rate=10 ** 6)
+        self.handoff = {}
+        self.is_primary = True
+        self.cluster_id = None
+        self.coglist = []
+        self.reminder_hour = 9
+        self.reminder_cooldown = 3600
+        self.appreciation_cache_bytes = 64 * 1024 * 1024
+        self.tenor_api_key = "benchmark"
+        self.tenor_base_url = tenor_base_url
+        self.gif_cache_file = os.path.join(directory, "gif_cache.json")
+        self.latency = 0.05
+        self.user = FakeUser(name="Duckmin")
+        self.users = {}
+        self.channels = {}
+        self.cogs = {}
+
+    def add_cog(self, cog):
+        self.cogs[cog.qualified_name] = cog
+        return cog
+
+    def get_cog(self, name):
+        return self.cogs.get(name)
+
+    def get_user(self, user_id):
+        return self.users.setdefault(user_id, FakeUser(user_id))
+
+    async def fetch_user(self, user_id):
+        return self.get_user(user_id)
+
+    async def create_dm(self, user):
+        # A FakeUser sends like a DM channel
+        return self.get_user(user.id)
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    async def wait_until_ready(self):
+        pass
+
+    def add_dynamic_items(self, *items):
+        pass
+
+    def remove_dynamic_items(self, *items):
+        pass
+
+    async def close(self):
+        await self.outbound.close()
+        await self.persistence.drain()
+        self.storage.close()
@@ -0,0 +1,197 @@
+import asyncio
+import datetime
+import random
+import time
+
+from aiohttp import web
+
+from benchmarks.fakes import FakeChannel, FakeChoice, FakeInteraction, FakeMessage, FakeUser
+from cogs.appreciation import Appreciation, NextAppreciationButton, ShuffleBag
+from cogs.commands import Commands
+from cogs.pikmin import Pikmin
+from cogs.random_gif import GIF_CHOICES, GifCog
+from cogs.task_reminder import ReminderButton, TaskReminder
+from tools.tenor_stub import TenorStub
+
+SCENARIOS = {}
+
+
+def scenario(name):
+    def register(function):
+        SCENARIOS[name] = function
+        return function
+    return register
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = []
+        self.ops = 0
+        self.elapsed = 0.0
+
+    async def measure(self, awaitable, ops=1):
+        # Batches record one sample of their average, so per-op timer overhead doesn't swamp tiny handlers
+        started = time.perf_counter()
+        result = await awaitable
+        elapsed = time.perf_counter() - started
+        self.samples.append(elapsed / ops)
+        self.ops += ops
+        self.elapsed += elapsed
+        return result
+
+
+def scaled(count, scale):
+    return max(1, int(count * scale))
+
+
+def seed_appreciations(bot, guilds, per_guild, today):
+    ops = []
+    for guild in range(guilds):
+        for user in range(per_guild):
+            entry = {"date": today, "appreciation": f"Thing {user}"}
+            ops.append(("set_appreciation", (str(guild), str(user), entry)))
+        ops.append(("set_saved_appreciations", (str(guild), "0", [f"Saved {i}" for i in range(5)])))
+    bot.storage.apply(ops)
+
+
+def seed_tasks(bot, users, per_user):
+    today = datetime.date.today()
+    ops = []
+    for user in range(users):
+        ops.extend(("set_task", (str(10 ** 17 + user), {
+            "id": i + 1, "task": f"Task {i}",
+            "due_date": (today + datetime.timedelta(days=(user + i) % 30)).isoformat(), "ignored_until": None
+        })) for i in range(per_user))
+    bot.storage.apply(ops)
+
+
+@scenario("appreciation_cold_show")
+async def appreciation_cold_show(bot, scale, recorder):
+    guilds = scaled(10000, scale)
+    seed_appreciations(bot, guilds, 5, Appreciation.current_adelaide_date())
+    cog = bot.add_cog(Appreciation(bot))
+    # Every guild is cold, so each /show_appreciations includes its lazy load
+    for guild in range(guilds):
+        interaction = FakeInteraction(bot, guild_id=guild)
+        await recorder.measure(cog.show_appreciations.callback(cog, interaction))
+
+
+@scenario("appreciation_browse")
+async def appreciation_browse(bot, scale, recorder):
+    guilds = scaled(1000, scale)
+    seed_appreciations(bot, guilds, 20, Appreciation.current_adelaide_date())
+    cog = bot.add_cog(Appreciation(bot))
+    day = cog.get_adelaide_date()
+    for _ in range(scaled(20000, scale)):
+        guild_id = str(random.randrange(guilds))
+        button = NextAppreciationButton(guild_id, day, ShuffleBag(20))
+        interaction = FakeInteraction(bot, guild_id=int(guild_id))
+        await recorder.measure(button.callback(interaction))
+
+
+@scenario("appreciation_submit")
+async def appreciation_submit(bot, scale, recorder):
+    guilds = scaled(1000, scale)
+    cog = bot.add_cog(Appreciation(bot))
+    for i in range(scaled(20000, scale)):
+        await recorder.measure(cog.record_appreciation(str(random.randrange(guilds)), str(i), f"Appreciation {i}"))
+    await recorder.measure(bot.persistence.flush())
+
+
+@scenario("tasks_startup")
+async def tasks_startup(bot, scale, recorder):
+    seed_tasks(bot, scaled(100000, scale), 3)
+
+    async def start():
+        return bot.add_cog(TaskReminder(bot))
+
+    await recorder.measure(start())
+
+
+@scenario("tasks_view")
+async def tasks_view(bot, scale, recorder):
+    users = scaled(100000, scale)
+    seed_tasks(bot, users, 25)
+    cog = bot.add_cog(TaskReminder(bot))
+    for _ in range(scaled(20000, scale)):
+        # A small set of hot users, so some pages come from the page memo
+        user_id = 10 ** 17 + (random.randrange(100) if random.random() < 0.5 else random.randrange(users))
+        interaction = FakeInteraction(bot, user=FakeUser(user_id))
+        await recorder.measure(cog.view_tasks.callback(cog, interaction))
+
+
+@scenario("tasks_mutate")
+async def tasks_mutate(bot, scale, recorder):
+    users = scaled(100000, scale)
+    seed_tasks(bot, users, 10)
+    cog = bot.add_cog(TaskReminder(bot))
+    for i in range(scaled(20000, scale)):
+        user = FakeUser(10 ** 17 + random.randrange(users))
+        interaction = FakeInteraction(bot, user=user)
+        if i % 2:
+            await recorder.measure(cog.add_task.callback(cog, interaction, f"New task {i}", "12-31"))
+        else:
+            reminded = cog.tasks_to_remind(str(user.id)) or [(task, 0) for task in cog.tasks[str(user.id)].values()]
+            ids = ReminderButton.encode_ids([task.id for task, _ in reminded], user.id)
+            button = ReminderButton(random.choice(("ignore_hour", "ignore_day")), user.id, ids)
+            await recorder.measure(button.callback(interaction))
+
+
+@scenario("on_message_firehose")
+async def on_message_firehose(bot, scale, recorder):
+    users = scaled(100000, scale)
+    seed_tasks(bot, users, 3)
+    cog = bot.add_cog(TaskReminder(bot))
+    authors = [FakeUser(10 ** 17 + random.randrange(users * 2)) for _ in range(1000)]
+    channels = [FakeChannel() for _ in range(100)]
+    messages = [FakeMessage(random.choice(authors), random.choice(channels)) for _ in range(1000)]
+
+    async def batch():
+        for message in messages:
+            await cog.on_message(message)
+
+    for _ in range(scaled(200, scale)):
+        await recorder.measure(batch(), ops=len(messages))
+
+
+@scenario("gif_random")
+async def gif_random(bot, scale, recorder):
+    runner = web.AppRunner(TenorStub(latency=0.02).app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    bot.tenor_base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/v2"
+    cog = bot.add_cog(GifCog(bot))
+    try:
+        await cog.cog_load()
+        await asyncio.gather(*cog.refills.values())
+        choices = list(GIF_CHOICES)
+        for _ in range(scaled(5000, scale)):
+            choice = random.choice(choices)
+            interaction = FakeInteraction(bot)
+            await recorder.measure(cog.random_gif.callback(cog, interaction, FakeChoice(choice)))
+    finally:
+        await cog.cog_unload()
+        await runner.cleanup()
+
+
+@scenario("pikmin_coloured_name")
+async def pikmin_coloured_name(bot, scale, recorder):
+    cog = bot.add_cog(Pikmin(bot))
+    colours = [*cog.color_map, "#123456", None]
+    for i in range(scaled(20000, scale)):
+        interaction = FakeInteraction(bot)
+        await recorder.measure(cog.coloured_name.callback(cog, interaction, f"Pikmin {i}", random.choice(colours),
+                                                          bool(i % 2), bool(i % 3)))
+
+
+@scenario("status")
+async def status(bot, scale, recorder):
+    cog = bot.add_cog(Commands(bot))
+    try:
+        for _ in range(scaled(5000, scale)):
+            interaction = FakeInteraction(bot)
+            await recorder.measure(cog.status.callback(cog, interaction))
+    finally:
+        await cog.cog_unload()
+
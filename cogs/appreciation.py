@@ -1,125 +1,210 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import json
 import datetime
-import pytz
+import asyncio
+import hashlib
 import random
+import math
+import time
+from utils.clock import ADELAIDE_TZ, seconds_until_midnight
+from utils.guild_cache import GuildCache
+from utils.logs import get_logger
+
+log = get_logger(__name__)
+
+
+# Rough per-entry cost on top of the text itself, for the guild cache budget
+ENTRY_OVERHEAD = 200
+
+
+class GuildAppreciations:
+    __slots__ = ("guild_id", "appreciations", "saved_appreciations", "today_index")
+
+    def __init__(self, guild_id, appreciations, saved_appreciations):
+        self.guild_id = guild_id
+        self.appreciations = appreciations
+        self.saved_appreciations = saved_appreciations
+        self.today_index = list(appreciations)
+
+    def drop_old(self, today):
+        self.appreciations = {k: v for k, v in self.appreciations.items() if v["date"] == today}
+        self.today_index = list(self.appreciations)
+
+    def today_appreciation(self, index):
+        return self.appreciations[self.today_index[index]]["appreciation"]
+
+    def approx_size(self):
+        entries = len(self.appreciations) + sum(len(saved_list) for saved_list in self.saved_appreciations.values())
+        return entries * ENTRY_OVERHEAD + \
+            sum(len(v["appreciation"]) for v in self.appreciations.values()) + \
+            sum(len(text) for saved_list in self.saved_appreciations.values() for text in saved_list)
 
 
 class Appreciation(commands.Cog):
+    adelaide_date = None
+
     def __init__(self, client):
-        self.saved_appreciations = None
-        self.appreciations = None
         self.client = client
-        self.appreciations_file = "appreciations.json"
-        self.saved_appreciations_file = "saved_appreciations.json"
-        self.load_appreciations()
-        self.load_saved_appreciations()
-
-    def load_appreciations(self):
-        try:
-            with open(self.appreciations_file, "r") as f:
-                self.appreciations = json.load(f)
-        except FileNotFoundError:
-            self.appreciations = {}
-
-    def save_appreciations(self):
-        with open(self.appreciations_file, "w") as f:
-            json.dump(self.appreciations, f)
-
-    def load_saved_appreciations(self):
-        try:
-            with open(self.saved_appreciations_file, "r") as f:
-                self.saved_appreciations = json.load(f)
-        except FileNotFoundError:
-            self.saved_appreciations = {}
-
-    def save_saved_appreciations(self):
-        with open(self.saved_appreciations_file, "w") as f:
-            json.dump(self.saved_appreciations, f)
+        self.persistence = client.persistence
+        Appreciation.adelaide_date = self.current_adelaide_date()
+        # Guilds are loaded on first use; ones with unflushed writes stay in memory so a reload can't lose them
+        self.guilds = GuildCache(self.load_guild, client.appreciation_cache_bytes, self.persistence.is_guild_pending)
+        self.rollover_task = None
+        # On /reload the previous instance hands over the guilds it had loaded, so nothing is re-read from storage
+        state = client.handoff.get(self.qualified_name)
+        if state:
+            for guild in state.get("guilds", ()):
+                self.guilds.put(guild.guild_id, GuildAppreciations(guild.guild_id, guild.appreciations,
+                                                                   guild.saved_appreciations))
+        self.persistence.purge_appreciations(self.get_adelaide_date())
+
+    async def cog_load(self):
+        self.rollover_task = asyncio.create_task(self.rollover())
+        self.client.handoff.pop(self.qualified_name, None)
+
+    async def cog_unload(self):
+        if self.rollover_task:
+            self.rollover_task.cancel()
+        self.client.remove_dynamic_items(SaveAppreciationButton, NextAppreciationButton, SavedAppreciationButton)
+
+    def export_state(self):
+        return {"guilds": self.guilds.values()}
+
+    @property
+    def stats(self):
+        return {**self.guilds.stats, "loaded_guilds": len(self.guilds), "cache_bytes": self.guilds.used}
+
+    async def load_guild(self, guild_id):
+        storage = self.client.storage
+        appreciations = await self.persistence.read(storage.load_guild_appreciations, guild_id,
+                                                    self.get_adelaide_date())
+        saved_appreciations = await self.persistence.read(storage.load_guild_saved_appreciations, guild_id)
+        return GuildAppreciations(guild_id, appreciations, saved_appreciations)
+
+    def save_appreciation(self, guild, user_id):
+        self.persistence.set_appreciation(guild.guild_id, user_id, guild.appreciations[user_id])
+        self.guilds.resize(guild.guild_id)
+
+    def save_saved_appreciations(self, guild, user_id):
+        self.persistence.set_saved_appreciations(guild.guild_id, user_id, guild.saved_appreciations.get(user_id))
+        self.guilds.resize(guild.guild_id)
 
     @staticmethod
-    def get_adelaide_date():
-        adelaide_tz = pytz.timezone("Australia/Adelaide")
-        return datetime.datetime.now(adelaide_tz).date().isoformat()
+    def current_adelaide_date():
+        return datetime.datetime.now(ADELAIDE_TZ).date().isoformat()
+
+    @classmethod
+    def get_adelaide_date(cls):
+        # Refreshed by the rollover task at Adelaide midnight
+        if cls.adelaide_date is None:
+            cls.adelaide_date = cls.current_adelaide_date()
+        return cls.adelaide_date
+
+    async def rollover(self):
+        while True:
+            await asyncio.sleep(seconds_until_midnight(ADELAIDE_TZ))
+            today = self.current_adelaide_date()
+            if today != Appreciation.adelaide_date:
+                Appreciation.adelaide_date = today
+                # Guilds that aren't loaded only load today's appreciations, so the purge just has to reach storage
+                for guild in self.guilds.values():
+                    guild.drop_old(today)
+                    self.guilds.resize(guild.guild_id)
+                self.persistence.purge_appreciations(today)
+
+    def store_appreciation(self, guild, user_id, entry):
+        previous = guild.appreciations.get(user_id)
+        if previous is None or previous["date"] != entry["date"]:
+            guild.today_index.append(user_id)
+        guild.appreciations[user_id] = entry
+
+    async def record_appreciation(self, guild_id, user_id, appreciation):
+        guild = await self.guilds.get(guild_id)
+        day = self.get_adelaide_date()
+        # Storage orders a guild's appreciations by when they were first shared, so a reloaded guild browses them
+        # in the same order as today_index; edits keep their place
+        previous = guild.appreciations.get(user_id)
+        shared_at = previous.get("shared_at", 0) if previous and previous["date"] == day else time.time()
+        self.store_appreciation(guild, user_id, {"date": day, "appreciation": appreciation, "shared_at": shared_at})
+        self.save_appreciation(guild, user_id)
+
+    async def apply_remote_change(self, kind, guild_id, user_id):
+        # Guilds that aren't loaded will read the change from storage when they are.
+        # Local writes that haven't been flushed yet win, and will reach the other processes when they are.
+        guild = self.guilds.peek(guild_id)
+        if guild is None:
+            return
+        if kind == "appreciation" and not self.persistence.is_pending(("appreciation", guild_id, user_id)):
+            entry = await asyncio.to_thread(self.client.storage.get_appreciation, guild_id, user_id)
+            if entry and entry["date"] == self.get_adelaide_date():
+                self.store_appreciation(guild, user_id, entry)
+        elif kind == "saved_appreciations" and \
+                not self.persistence.is_pending(("saved_appreciations", guild_id, user_id)):
+            saved_list = await asyncio.to_thread(self.client.storage.get_saved_appreciations, guild_id, user_id)
+            if saved_list:
+                guild.saved_appreciations[user_id] = saved_list
+            else:
+                guild.saved_appreciations.pop(user_id, None)
+        self.guilds.resize(guild_id)
+
+    async def send_today_appreciation(self, interaction: discord.Interaction):
+        guild = await self.guilds.get(str(interaction.guild_id))
+
+        size = len(guild.today_index)
+        if not size:
+            await interaction.response.send_message(
+                "No appreciations have been shared today. I would love to know what you find appreciative today.",
+                ephemeral=True)
+            return
+
+        bag = ShuffleBag(size)
+        index = bag.next(size)
+        embed = discord.Embed(title="A Appreciation", description=guild.today_appreciation(index),
+                              color=discord.Color.green())
 
-    def clean_old_appreciations(self):
-        today = self.get_adelaide_date()
-        for guild_id in self.appreciations:
-            self.appreciations[guild_id] = {k: v for k, v in self.appreciations[guild_id].items() if v["date"] == today}
-        self.save_appreciations()
+        view = AppreciationView(guild.guild_id, self.get_adelaide_date(), bag, guild.today_index[index])
+        await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
-    @app_commands.command(name="appreciate", description="Your daily appreciation.")
+    # Usually answered with a modal, which can't be sent once the interaction is deferred
+    @app_commands.command(name="appreciate", description="Your daily appreciation.", extras={"auto_defer": False})
     async def appreciate(self, interaction: discord.Interaction):
-        self.clean_old_appreciations()
         guild_id = str(interaction.guild_id)
         user_id = str(interaction.user.id)
-        today = self.get_adelaide_date()
-
-        if guild_id not in self.appreciations:
-            self.appreciations[guild_id] = {}
+        guild = await self.guilds.get(guild_id)
 
-        if user_id in self.appreciations[guild_id] and self.appreciations[guild_id][user_id]["date"] == today:
-            view = AppreciationOptionsView(self, guild_id, user_id)
+        if user_id in guild.appreciations and guild.appreciations[user_id]["date"] == self.get_adelaide_date():
+            view = AppreciationOptionsView(guild_id, user_id)
             await interaction.response.send_message(
                 "You've already shared an appreciation today. What would you like to do?", view=view, ephemeral=True)
         else:
-            await interaction.response.send_modal(AppreciationModal(self, guild_id, user_id))
+            await interaction.response.send_modal(AppreciationModal(guild_id, user_id))
 
     @app_commands.command(name="show_appreciations",
                           description="Look through the appreciations that someone had today.")
     async def show_appreciations(self, interaction: discord.Interaction):
-        self.clean_old_appreciations()
-        guild_id = str(interaction.guild_id)
-        today = self.get_adelaide_date()
-
-        if guild_id not in self.appreciations:
-            await interaction.response.send_message(
-                "No appreciations have been shared today. I would love to know what you find appreciative today.",
-                ephemeral=True)
-            return
-
-        today_appreciations = [v["appreciation"] for v in self.appreciations[guild_id].values() if v["date"] == today]
-
-        if not today_appreciations:
-            await interaction.response.send_message("No appreciations have been shared in this server today.",
-                                                    ephemeral=True)
-            return
-
-        appreciation = random.choice(today_appreciations)
-        embed = discord.Embed(title="A Appreciation", description=appreciation,
-                              color=discord.Color.green())
-
-        view = AppreciationView(self, interaction.guild_id, interaction.user.id, today_appreciations, appreciation)
-        await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
+        await self.send_today_appreciation(interaction)
 
     @app_commands.command(name="saved_appreciations", description="See your saved appreciations.")
     async def saved_appreciations(self, interaction: discord.Interaction):
         guild_id = str(interaction.guild_id)
         user_id = str(interaction.user.id)
+        guild = await self.guilds.get(guild_id)
 
-        if guild_id not in self.saved_appreciations or user_id not in self.saved_appreciations[guild_id] or not \
-                self.saved_appreciations[guild_id][user_id]:
-            view = ShowAppreciationsView(self, interaction.guild_id, interaction.user.id)
+        saved_list = guild.saved_appreciations.get(user_id)
+        if not saved_list:
+            view = ShowAppreciationsView(interaction.guild_id, interaction.user.id)
             await interaction.response.send_message(
                 "You haven't saved any appreciations yet. Would you like to see today's appreciations?",
                 view=view, ephemeral=True)
             return
 
-        saved_list = self.saved_appreciations[guild_id][user_id]
-        view = SavedAppreciationView(self, guild_id, user_id, saved_list)
-        embed = discord.Embed(title=f"Saved Appreciation 1/{len(saved_list)}", description=saved_list[0],
-                              color=discord.Color.blue())
-        await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
-
-        saved_list = self.saved_appreciations[guild_id][user_id]
-        view = SavedAppreciationView(self, guild_id, user_id, saved_list)
-        embed = discord.Embed(title=f"Saved Appreciation 1/{len(saved_list)}", description=saved_list[0],
-                              color=discord.Color.blue())
-        await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
+        view = SavedAppreciationView(guild_id, user_id, 0)
+        await interaction.response.send_message(embed=SavedAppreciationView.embed(saved_list, 0), view=view,
+                                                ephemeral=True)
 
 
+# Like the dynamic items, these look the cog up when used, so one opened before a /reload uses the new instance
 class AppreciationModal(discord.ui.Modal, title="Daily Appreciation"):
     appreciation = discord.ui.TextInput(
         label="What do you appreciate today?",
@@ -127,25 +212,16 @@ class AppreciationModal(discord.ui.Modal, title="Daily Appreciation"):
         placeholder="Express till your heart's content!"
     )
 
-    def __init__(self, appreciation_cog, guild_id, user_id, initial_value=""):
+    def __init__(self, guild_id, user_id, initial_value=""):
         super().__init__()
-        self.appreciation_cog = appreciation_cog
         self.guild_id = guild_id
         self.user_id = user_id
         if initial_value:
             self.appreciation.default = initial_value
 
     async def on_submit(self, interaction: discord.Interaction):
-        today = Appreciation.get_adelaide_date()
-
-        if self.guild_id not in self.appreciation_cog.appreciations:
-            self.appreciation_cog.appreciations[self.guild_id] = {}
-
-        self.appreciation_cog.appreciations[self.guild_id][self.user_id] = {
-            "date": today,
-            "appreciation": self.appreciation.value
-        }
-        self.appreciation_cog.save_appreciations()
+        appreciation_cog = interaction.client.get_cog("Appreciation")
+        await appreciation_cog.record_appreciation(self.guild_id, self.user_id, self.appreciation.value)
 
         await interaction.response.send_message(
             f"Thanks for sharing your appreciation for today. Have a nice rest of your day and see you tomorrow.",
@@ -153,148 +229,233 @@ class AppreciationModal(discord.ui.Modal, title="Daily Appreciation"):
 
 
 class AppreciationOptionsView(discord.ui.View):
-    def __init__(self, appreciation_cog, guild_id, user_id):
+    def __init__(self, guild_id, user_id):
         super().__init__()
-        self.appreciation_cog = appreciation_cog
         self.guild_id = guild_id
         self.user_id = user_id
 
     @discord.ui.button(label="Edit", style=discord.ButtonStyle.primary)
     async def edit(self, interaction: discord.Interaction, button: discord.ui.Button):
-        current_appreciation = self.appreciation_cog.appreciations[self.guild_id][self.user_id]["appreciation"]
-        await interaction.response.send_modal(
-            AppreciationModal(self.appreciation_cog, self.guild_id, self.user_id, current_appreciation))
+        guild = await interaction.client.get_cog("Appreciation").guilds.get(self.guild_id)
+        current_appreciation = guild.appreciations[self.user_id]["appreciation"] \
+            if self.user_id in guild.appreciations else ""
+        await interaction.response.send_modal(AppreciationModal(self.guild_id, self.user_id, current_appreciation))
 
     @discord.ui.button(label="Come back tomorrow", style=discord.ButtonStyle.secondary)
     async def come_back_tomorrow(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.send_message("See you tomorrow. Have a nice day!", ephemeral=True)
 
 
+class ShuffleBag:
+    # An affine permutation (stride coprime to size) stands in for a shuffled list, so each draw is O(1),
+    # nothing repeats until every index has been drawn once, and the whole bag fits in a custom_id
+    def __init__(self, size, stride=None, offset=None, cursor=0):
+        self.size = size
+        self.stride = stride if stride is not None else self.random_stride(size)
+        self.offset = offset if offset is not None else random.randrange(size)
+        self.cursor = cursor
+
+    @staticmethod
+    def random_stride(size):
+        if size <= 2:
+            return 1
+        while True:
+            stride = random.randrange(1, size)
+            if math.gcd(stride, size) == 1:
+                return stride
+
+    def next(self, size):
+        # Appreciations shared after the bag was drawn join the next round
+        if self.cursor >= self.size or self.size > size:
+            self.__init__(size)
+        index = (self.stride * self.cursor + self.offset) % self.size
+        self.cursor += 1
+        return index
+
+
 class AppreciationView(discord.ui.View):
-    def __init__(self, appreciation_cog, guild_id, user_id, appreciations, current_appreciation):
-        super().__init__()
-        self.appreciation_cog = appreciation_cog
+    def __init__(self, guild_id, day, bag, author_id):
+        super().__init__(timeout=None)
+        self.add_item(SaveAppreciationButton(guild_id, day, author_id))
+        self.add_item(NextAppreciationButton(guild_id, day, bag))
+
+
+class SaveAppreciationButton(discord.ui.DynamicItem[discord.ui.Button],
+                             template=r"appreciation:save:(?P<guild_id>\w+):(?P<day>[\d-]+):u(?P<author_id>\d+)"):
+    # Names the appreciation by its author, since positions in today_index can change when a guild is reloaded
+    def __init__(self, guild_id, day, author_id):
+        super().__init__(discord.ui.Button(label="Save", style=discord.ButtonStyle.green,
+                                           custom_id=f"appreciation:save:{guild_id}:{day}:u{author_id}"))
         self.guild_id = str(guild_id)
-        self.user_id = str(user_id)
-        self.appreciations = appreciations
-        self.current_appreciation = current_appreciation
-        self.shown_appreciations = {current_appreciation}
-
-    @discord.ui.button(label="Save", style=discord.ButtonStyle.green)
-    async def save(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if self.guild_id not in self.appreciation_cog.saved_appreciations:
-            self.appreciation_cog.saved_appreciations[self.guild_id] = {}
-        if self.user_id not in self.appreciation_cog.saved_appreciations[self.guild_id]:
-            self.appreciation_cog.saved_appreciations[self.guild_id][self.user_id] = []
-        if self.current_appreciation not in self.appreciation_cog.saved_appreciations[self.guild_id][self.user_id]:
-            self.appreciation_cog.saved_appreciations[self.guild_id][self.user_id].append(self.current_appreciation)
-            self.appreciation_cog.save_saved_appreciations()
+        self.day = day
+        self.author_id = str(author_id)
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["guild_id"], match["day"], match["author_id"])
+
+    async def callback(self, interaction: discord.Interaction):
+        appreciation_cog = interaction.client.get_cog("Appreciation")
+        day = appreciation_cog.get_adelaide_date()
+        guild = await appreciation_cog.guilds.get(self.guild_id)
+        entry = guild.appreciations.get(self.author_id)
+        if self.day != day or entry is None or entry["date"] != day:
+            await interaction.response.send_message("This appreciation is no longer available.", ephemeral=True)
+            return
+
+        appreciation = entry["appreciation"]
+        user_id = str(interaction.user.id)
+        saved_list = guild.saved_appreciations.setdefault(user_id, [])
+        if appreciation not in saved_list:
+            saved_list.append(appreciation)
+            appreciation_cog.save_saved_appreciations(guild, user_id)
             await interaction.response.send_message("Appreciation saved!", ephemeral=True)
         else:
             await interaction.response.send_message("You've already saved this appreciation.", ephemeral=True)
 
-    @discord.ui.button(label="Next", style=discord.ButtonStyle.grey)
-    async def next(self, interaction: discord.Interaction, button: discord.ui.Button):
-        remaining_appreciations = [a for a in self.appreciations if a not in self.shown_appreciations]
 
-        if not remaining_appreciations:
-            # If all appreciations have been shown, start over
-            self.shown_appreciations.clear()
-            remaining_appreciations = self.appreciations
+class NextAppreciationButton(discord.ui.DynamicItem[discord.ui.Button],
+                             template=r"appreciation:next:(?P<guild_id>\w+):(?P<day>[\d-]+):"
+                                      r"(?P<size>\d+):(?P<stride>\d+):(?P<offset>\d+):(?P<cursor>\d+)"):
+    def __init__(self, guild_id, day, bag):
+        super().__init__(discord.ui.Button(
+            label="Next", style=discord.ButtonStyle.grey,
+            custom_id=f"appreciation:next:{guild_id}:{day}:{bag.size}:{bag.stride}:{bag.offset}:{bag.cursor}"))
+        self.guild_id = str(guild_id)
+        self.day = day
+        self.bag = bag
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        bag = ShuffleBag(int(match["size"]), int(match["stride"]), int(match["offset"]), int(match["cursor"]))
+        return cls(match["guild_id"], match["day"], bag)
+
+    async def callback(self, interaction: discord.Interaction):
+        appreciation_cog = interaction.client.get_cog("Appreciation")
+        day = appreciation_cog.get_adelaide_date()
+        guild = await appreciation_cog.guilds.get(self.guild_id)
+        size = len(guild.today_index)
+        if not size:
+            await interaction.response.edit_message(content="No appreciations have been shared in this server today.",
+                                                    embed=None, view=None)
+            return
 
-        self.current_appreciation = random.choice(remaining_appreciations)
-        self.shown_appreciations.add(self.current_appreciation)
+        if self.day != day:
+            self.bag = ShuffleBag(size)
+        index = self.bag.next(size)
 
-        embed = discord.Embed(title="A Appreciation", description=self.current_appreciation,
-                              color=discord.Color.green())
-        await interaction.response.edit_message(embed=embed, view=self)
+        appreciation = guild.today_appreciation(index)
+        embed = discord.Embed(title="A Appreciation", description=appreciation, color=discord.Color.green())
+        await interaction.response.edit_message(embed=embed, view=AppreciationView(self.guild_id, day, self.bag,
+                                                                                  guild.today_index[index]))
 
 
 class SavedAppreciationView(discord.ui.View):
-    def __init__(self, appreciation_cog, guild_id, user_id, saved_list):
-        super().__init__()
-        self.appreciation_cog = appreciation_cog
-        self.guild_id = guild_id
-        self.user_id = user_id
-        self.saved_list = saved_list
-        self.current_index = 0
-        self.confirming_forget = False
-
-    @discord.ui.button(label="Previous", style=discord.ButtonStyle.gray)
-    async def previous(self, interaction: discord.Interaction, button: discord.ui.Button):
-        self.current_index = (self.current_index - 1) % len(self.saved_list)
-        await self.update_message(interaction)
-
-    @discord.ui.button(label="Next", style=discord.ButtonStyle.gray)
-    async def next(self, interaction: discord.Interaction, button: discord.ui.Button):
-        self.current_index = (self.current_index + 1) % len(self.saved_list)
-        await self.update_message(interaction)
-
-    @discord.ui.button(label="Forget", style=discord.ButtonStyle.red)
-    async def forget(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if not self.confirming_forget:
-            self.confirming_forget = True
-            await interaction.response.send_message(
-                "Are you sure you want to forget this appreciation? Click the Forget button again to confirm.",
-                ephemeral=True)
+    def __init__(self, guild_id, user_id, index, forgetting=None):
+        super().__init__(timeout=None)
+        self.add_item(SavedAppreciationButton("previous", guild_id, user_id, index))
+        self.add_item(SavedAppreciationButton("next", guild_id, user_id, index))
+        if forgetting is None:
+            self.add_item(SavedAppreciationButton("forget", guild_id, user_id, index))
         else:
-            removed_appreciation = self.saved_list.pop(self.current_index)
-            self.appreciation_cog.saved_appreciations[self.guild_id][self.user_id] = self.saved_list
-            self.appreciation_cog.save_saved_appreciations()
+            self.add_item(SavedAppreciationButton("confirm", guild_id, user_id, index,
+                                                  SavedAppreciationButton.digest(forgetting)))
 
-            if not self.saved_list:
-                await interaction.response.edit_message(content="You have no more saved appreciations.", embed=None,
-                                                        view=None)
-            else:
-                self.current_index = min(self.current_index, len(self.saved_list) - 1)
-                await self.update_message(interaction)
-
-            self.confirming_forget = False
-
-    async def update_message(self, interaction: discord.Interaction):
-        embed = discord.Embed(
-            title=f"Saved Appreciation {self.current_index + 1}/{len(self.saved_list)}",
-            description=self.saved_list[self.current_index],
+    @staticmethod
+    def embed(saved_list, index):
+        return discord.Embed(
+            title=f"Saved Appreciation {index + 1}/{len(saved_list)}",
+            description=saved_list[index],
             color=discord.Color.blue()
         )
-        self.confirming_forget = False  # Reset confirmation state when changing appreciation
-        await interaction.response.edit_message(embed=embed, view=self)
 
 
-class ShowAppreciationsView(discord.ui.View):
-    def __init__(self, appreciation_cog, guild_id, user_id):
-        super().__init__()
-        self.appreciation_cog = appreciation_cog
+class SavedAppreciationButton(discord.ui.DynamicItem[discord.ui.Button],
+                              template=r"saved:(?P<action>previous|next|forget|confirm):"
+                                       r"(?P<guild_id>\w+):(?P<user_id>\d+):(?P<index>\d+)(?::(?P<digest>[0-9a-f]+))?"):
+    labels = {
+        "previous": ("Previous", discord.ButtonStyle.gray),
+        "next": ("Next", discord.ButtonStyle.gray),
+        "forget": ("Forget", discord.ButtonStyle.red),
+        "confirm": ("Forget", discord.ButtonStyle.red),
+    }
+
+    # Confirming carries a hash of the appreciation being forgotten, since the list may have changed since
+    def __init__(self, action, guild_id, user_id, index, digest=None):
+        label, style = self.labels[action]
+        custom_id = f"saved:{action}:{guild_id}:{user_id}:{index}" + (f":{digest}" if digest else "")
+        super().__init__(discord.ui.Button(label=label, style=style, custom_id=custom_id))
+        self.action = action
         self.guild_id = str(guild_id)
         self.user_id = str(user_id)
+        self.index = index
+        self.expected_digest = digest
 
-    @discord.ui.button(label="Show Today's Appreciations", style=discord.ButtonStyle.primary)
-    async def show_appreciations(self, interaction: discord.Interaction, button: discord.ui.Button):
-        self.appreciation_cog.clean_old_appreciations()
-        today = self.appreciation_cog.get_adelaide_date()
+    @staticmethod
+    def digest(appreciation):
+        return hashlib.blake2b(appreciation.encode(), digest_size=4).hexdigest()
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["action"], match["guild_id"], match["user_id"], int(match["index"]), match["digest"])
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        if str(interaction.user.id) != self.user_id:
+            await interaction.response.send_message("This button is not for you.", ephemeral=True)
+            return False
+        return True
+
+    async def callback(self, interaction: discord.Interaction):
+        appreciation_cog = interaction.client.get_cog("Appreciation")
+        guild = await appreciation_cog.guilds.get(self.guild_id)
+        saved_list = guild.saved_appreciations.get(self.user_id)
+        if not saved_list:
+            await interaction.response.edit_message(content="You have no more saved appreciations.", embed=None,
+                                                    view=None)
+            return
 
-        if self.guild_id not in self.appreciation_cog.appreciations:
-            await interaction.response.send_message(
-                "No appreciations have been shared today. I would love to know what you find appreciative today.",
-                ephemeral=True)
+        index = min(self.index, len(saved_list) - 1)
+        if self.action == "previous":
+            index = (index - 1) % len(saved_list)
+        elif self.action == "next":
+            index = (index + 1) % len(saved_list)
+        elif self.action == "forget":
+            await interaction.response.edit_message(
+                content="Are you sure you want to forget this appreciation? Click the Forget button again to confirm.",
+                embed=SavedAppreciationView.embed(saved_list, index),
+                view=SavedAppreciationView(self.guild_id, self.user_id, index, forgetting=saved_list[index]))
             return
+        elif self.index >= len(saved_list) or self.expected_digest != self.digest(saved_list[self.index]):
+            await interaction.response.edit_message(
+                content="Your saved appreciations changed since then, so nothing was forgotten.",
+                embed=SavedAppreciationView.embed(saved_list, index),
+                view=SavedAppreciationView(self.guild_id, self.user_id, index))
+            return
+        else:
+            saved_list.pop(index)
+            appreciation_cog.save_saved_appreciations(guild, self.user_id)
+            if not saved_list:
+                await interaction.response.edit_message(content="You have no more saved appreciations.", embed=None,
+                                                        view=None)
+                return
+            index = min(index, len(saved_list) - 1)
 
-        today_appreciations = [v["appreciation"] for v in self.appreciation_cog.appreciations[self.guild_id].values() if
-                               v["date"] == today]
+        await interaction.response.edit_message(content=None, embed=SavedAppreciationView.embed(saved_list, index),
+                                                view=SavedAppreciationView(self.guild_id, self.user_id, index))
 
-        if not today_appreciations:
-            await interaction.response.send_message("No appreciations have been shared in this server today.",
-                                                    ephemeral=True)
-            return
 
-        appreciation = random.choice(today_appreciations)
-        embed = discord.Embed(title="A Appreciation", description=appreciation,
-                              color=discord.Color.green())
+class ShowAppreciationsView(discord.ui.View):
+    def __init__(self, guild_id, user_id):
+        super().__init__()
+        self.guild_id = str(guild_id)
+        self.user_id = str(user_id)
 
-        view = AppreciationView(self.appreciation_cog, self.guild_id, self.user_id, today_appreciations, appreciation)
-        await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
+    @discord.ui.button(label="Show Today's Appreciations", style=discord.ButtonStyle.primary)
+    async def show_appreciations(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.client.get_cog("Appreciation").send_today_appreciation(interaction)
 
 
 async def setup(client):
+    client.add_dynamic_items(SaveAppreciationButton, NextAppreciationButton, SavedAppreciationButton)
     await client.add_cog(Appreciation(client))
-    print("- appreciation.py loaded -")
+    log.info("appreciation.py loaded")
@@ -4,54 +4,167 @@ from discord import app_commands
 
 import time
 import asyncio
+from utils.logs import get_logger, interaction_logger
+from utils.metrics import metrics
+
+log = get_logger(__name__)
+
+
+async def is_owner(interaction: discord.Interaction):
+    return await interaction.client.is_owner(interaction.user)
 
 
 class StatusView(discord.ui.View):
-    def __init__(self, client, time_started):
+    def __init__(self, broadcaster):
         super().__init__(timeout=None)
-        self.client = client
-        self.time_started = time_started
-        self.message = None
+        self.broadcaster = broadcaster
 
     @discord.ui.button(label="Stop Updating", style=discord.ButtonStyle.red)
     async def stop_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        self.stop()
+        self.broadcaster.unsubscribe(interaction.message.id)
         button.disabled = True
         button.label = "Updates Stopped"
         await interaction.response.edit_message(view=self)
 
-    async def update_embed(self):
-        while not self.is_finished():
-            now = time.time()
-            uptime = now - self.time_started
-            uptime_sec = int(uptime % 60)
-            uptime_min = int((uptime // 60) % 60)
-            uptime_hour = int((uptime // 3600) % 24)
-            uptime_day = int(uptime // 86400)
-
-            # Fetch current latency
-            latency = round(self.client.latency * 1000)
-
-            status_embed = discord.Embed(title="Status", description="How well is Duckmin running?",
-                                         colour=discord.Colour.blue())
-            status_embed.add_field(name="📶 Ping", value=f"Latency: {latency}ms", inline=False)
-            status_embed.add_field(name="⌚ Uptime",
-                                   value=f"{uptime_day:02d}:{uptime_hour:02d}:{uptime_min:02d}:{uptime_sec:02d}",
-                                   inline=True)
-            status_embed.set_footer(text="Last updated")
-            status_embed.timestamp = discord.utils.utcnow()
-
-            if self.message:
-                await self.message.edit(embed=status_embed)
 
-            await asyncio.sleep(5)
+class StatusBroadcaster:
+    # Interaction tokens expire after 15 minutes, so idle panels are dropped before their edits start failing
+    def __init__(self, client, time_started, max_subscribers=25, idle_timeout=600, min_interval=5, max_interval=60,
+                 edits_per_second=2):
+        self.client = client
+        self.time_started = time_started
+        self.max_subscribers = max_subscribers
+        self.idle_timeout = idle_timeout
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.edits_per_second = edits_per_second
+        self.subscribers = {}
+        self.task = None
+
+    def is_full(self):
+        return len(self.subscribers) >= self.max_subscribers
+
+    def subscribe(self, message, view):
+        self.subscribers[message.id] = (message, view, time.monotonic())
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    def unsubscribe(self, message_id):
+        subscriber = self.subscribers.pop(message_id, None)
+        if subscriber:
+            subscriber[1].stop()
+
+    def interval(self):
+        # Spread the edits of every panel across the rate-limit budget, and back off while the outbound queue is busy
+        interval = len(self.subscribers) / self.edits_per_second
+        if self.client.outbound.queue_depth > len(self.subscribers):
+            interval *= 2
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def build_embed(self):
+        now = time.time()
+        uptime = now - self.time_started
+        uptime_sec = int(uptime % 60)
+        uptime_min = int((uptime // 60) % 60)
+        uptime_hour = int((uptime // 3600) % 24)
+        uptime_day = int(uptime // 86400)
+
+        # Fetch current latency
+        latency = round(self.client.latency * 1000)
+
+        status_embed = discord.Embed(title="Status", description="How well is Duckmin running?",
+                                     colour=discord.Colour.blue())
+        status_embed.add_field(name="📶 Ping", value=f"Latency: {latency}ms", inline=False)
+        shard_latencies = getattr(self.client, "latencies", [])
+        if len(shard_latencies) > 1:
+            # Only the worst shards are listed so large clusters stay within the embed field limit
+            worst = sorted(shard_latencies, key=lambda shard: shard[1], reverse=True)[:10]
+            lines = [f"Shard {shard_id}: {round(shard_latency * 1000)}ms" for shard_id, shard_latency in worst]
+            if self.client.cluster_id is not None:
+                lines.insert(0, f"Cluster {self.client.cluster_id}")
+            status_embed.add_field(name="🧩 Shards", value="\n".join(lines), inline=False)
+        status_embed.add_field(name="⌚ Uptime",
+                               value=f"{uptime_day:02d}:{uptime_hour:02d}:{uptime_min:02d}:{uptime_sec:02d}",
+                               inline=True)
+        status_embed.add_field(name="📊 Performance", value=self.metrics_summary(), inline=False)
+        status_embed.set_footer(text="Last updated")
+        status_embed.timestamp = discord.utils.utcnow()
+        return status_embed
+
+    @staticmethod
+    def metrics_summary():
+        lines = []
+        lag = metrics.histograms_named("event_loop_lag_seconds")
+        if lag:
+            lines.append(f"Loop lag p99: {lag[0][1].quantile(0.99) * 1000:.1f}ms")
+        acks = metrics.histograms_named("command_ack_seconds")
+        if acks:
+            served = sum(histogram.count for _, histogram in acks)
+            labels, slowest = max(acks, key=lambda item: item[1].quantile(0.99))
+            lines.append(f"Commands: {served} acked, slowest p99 /{labels['command']} "
+                         f"{slowest.quantile(0.99) * 1000:.0f}ms")
+        deadline = [(metrics.counter_total(f"command_{kind}_total"), label) for kind, label in
+                    (("auto_defers", "auto-deferred"), ("near_misses", "near misses"), ("expired", "expired"))]
+        if any(count for count, _ in deadline):
+            lines.append("Deadline: " + ", ".join(f"{count} {label}" for count, label in deadline))
+        flushes = metrics.histograms_named("persistence_flush_seconds")
+        if flushes:
+            lines.append(f"Save p99: {flushes[0][1].quantile(0.99) * 1000:.1f}ms")
+        requests = metrics.histograms_named("outbound_request_seconds")
+        if requests:
+            count = sum(histogram.count for _, histogram in requests)
+            total = sum(histogram.sum for _, histogram in requests)
+            lines.append(f"Discord HTTP: {count} requests, avg {total / count * 1000:.0f}ms")
+        return "\n".join(lines) or "No data yet"
+
+    def edit_done(self, message_id, future):
+        if not future.cancelled() and isinstance(future.exception(), discord.NotFound):
+            self.unsubscribe(message_id)
+
+    async def run(self):
+        while self.subscribers:
+            await asyncio.sleep(self.interval())
+            status_embed = self.build_embed()
+            now = time.monotonic()
+            for message_id, (message, view, subscribed) in list(self.subscribers.items()):
+                if now - subscribed > self.idle_timeout:
+                    self.unsubscribe(message_id)
+                    continue
+                # Not awaited: if edits back up, the dispatcher only sends the latest embed
+                # The panels are interaction responses, so these edits go through the interaction webhook
+                future = self.client.outbound.submit(f"webhook:{message_id}",
+                                                     lambda message=message: message.edit(embed=status_embed),
+                                                     coalesce_key=f"status:{message_id}", idempotent=True)
+                future.add_done_callback(lambda f, message_id=message_id: self.edit_done(message_id, f))
+
+    def close(self):
+        for message_id in list(self.subscribers):
+            self.unsubscribe(message_id)
+        if self.task:
+            self.task.cancel()
 
 
 class Commands(commands.Cog):
     def __init__(self, client):
         self.client = client
         self.colour = 0xf4d45e
-        self.time_started = time.time()
+        # Uptime carries over when this cog is reloaded
+        state = client.handoff.get(self.qualified_name)
+        self.time_started = state["time_started"] if state else time.time()
+        self.broadcaster = StatusBroadcaster(client, self.time_started)
+
+    async def cog_load(self):
+        self.client.handoff.pop(self.qualified_name, None)
+
+    async def cog_unload(self):
+        self.broadcaster.close()
+
+    def export_state(self):
+        return {"time_started": self.time_started}
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        self.broadcaster.unsubscribe(payload.message_id)
 
     # github (link, suggestions)
     @app_commands.command(name="repo", description="The link to the bots repo")
@@ -66,15 +179,67 @@ class Commands(commands.Cog):
     # Status (ping, uptime)
     @app_commands.command(name="status", description="How well is Duckmin running?")
     async def status(self, interaction: discord.Interaction):
-        view = StatusView(self.client, self.time_started)
-        await interaction.response.send_message("Loading status...", ephemeral=True)
-        message = await interaction.original_response()
-        view.message = message
+        status_embed = self.broadcaster.build_embed()
+        if self.broadcaster.is_full():
+            await interaction.response.send_message(embed=status_embed, ephemeral=True)
+            return
 
-        self.client.loop.create_task(view.update_embed())
-        await message.edit(content=None, view=view)
+        view = StatusView(self.broadcaster)
+        await interaction.response.send_message(embed=status_embed, view=view, ephemeral=True)
+        message = await interaction.original_response()
+        self.broadcaster.subscribe(message, view)
+
+    @app_commands.command(name="reload", description="Reload one of Duckmin's cogs (owner only)")
+    @app_commands.describe(cog="The extension to reload, e.g. cogs.task_reminder")
+    @app_commands.check(is_owner)
+    async def reload(self, interaction: discord.Interaction, cog: str):
+        if cog not in self.client.coglist:
+            await interaction.response.send_message(f"Unknown cog `{cog}`.", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        try:
+            elapsed = await self.client.reload_cog(cog)
+        except commands.ExtensionError as err:
+            interaction_logger(log, interaction).exception("Error reloading %s", cog)
+            await interaction.followup.send(f"Failed to reload `{cog}`, the previous version is still running: {err}",
+                                            ephemeral=True)
+            return
+        await interaction.followup.send(f"Reloaded `{cog}` in {elapsed * 1000:.0f}ms.", ephemeral=True)
+
+    @reload.autocomplete("cog")
+    async def reload_autocomplete(self, interaction: discord.Interaction, current: str):
+        return [app_commands.Choice(name=ext, value=ext) for ext in self.client.coglist if current in ext][:25]
+
+    @reload.error
+    async def reload_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        if isinstance(error, app_commands.CheckFailure):
+            await interaction.response.send_message("Only the bot owner can reload cogs.", ephemeral=True)
+
+    @app_commands.command(name="profile", description="Profile Duckmin's event loop for a while (owner only)")
+    @app_commands.describe(seconds="How long to profile for", top="How many entries to list per section")
+    @app_commands.check(is_owner)
+    async def profile(self, interaction: discord.Interaction, seconds: app_commands.Range[int, 1, 600] = 30,
+                      top: app_commands.Range[int, 1, 25] = 10):
+        if self.client.profiler.active:
+            await interaction.response.send_message("A profile is already running.", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        # A SIGUSR1 profile may have started while deferring
+        if self.client.profiler.active:
+            await interaction.followup.send("A profile is already running.", ephemeral=True)
+            return
+        path, summary = await self.client.profiler.profile(seconds, top)
+        # Summaries longer than a message are cut short; the attached stacks have everything
+        await interaction.followup.send(f"```\n{summary[:1900]}\n```", file=discord.File(path), ephemeral=True)
+
+    @profile.error
+    async def profile_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        if isinstance(error, app_commands.CheckFailure):
+            await interaction.response.send_message("Only the bot owner can profile the bot.", ephemeral=True)
 
 
 async def setup(client):
     await client.add_cog(Commands(client))
-    print("- commands.py loaded -")
+    log.info("commands.py loaded")
@@ -1,6 +1,9 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
+from utils.logs import get_logger
+
+log = get_logger(__name__)
 
 
 class Pikmin(commands.Cog):
@@ -29,7 +32,8 @@ class Pikmin(commands.Cog):
     }
 
     @app_commands.command(name="coloured_name",
-                          description="Generate a coloured name for your Pikmin using Unity rich text format.")
+                          description="Generate a coloured name for your Pikmin using Unity rich text format.",
+                          extras={"defer_ephemeral": False})
     @app_commands.describe(
         name="The name for your Pikmin",
         color="Color name (e.g., red, blue, green) or hex code (e.g., #FF0000)",
@@ -60,12 +64,15 @@ class Pikmin(commands.Cog):
                 color = color[1:]
             formatted_name = f"<color=#{color}>{formatted_name}</color>"
 
-        await interaction.response.send_message("Here's your formatted Pikmin name:")
-        await interaction.followup.send(f"`{formatted_name}`")
-        await interaction.followup.send(
-            "If you want multiple colours, run the /coloured_name command again and add it to the end of the one you just generated.")
+        # Paced per channel, since a route per interaction would only ever send these three
+        route = f"interaction:{interaction.channel_id}"
+        outbound = self.client.outbound
+        await outbound.send(route, lambda: interaction.response.send_message("Here's your formatted Pikmin name:"))
+        await outbound.send(route, lambda: interaction.followup.send(f"`{formatted_name}`"))
+        await outbound.send(route, lambda: interaction.followup.send(
+            "If you want multiple colours, run the /coloured_name command again and add it to the end of the one you just generated."))
 
 
 async def setup(client):
     await client.add_cog(Pikmin(client))
-    print("- pikmin.py loaded -")
+    log.info("pikmin.py loaded")
@@ -1,30 +1,121 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
+import asyncio
+import collections
+import json
 import random
 import time
+from utils.storage import JSONStorage
+from utils.logs import get_logger, interaction_logger
+from utils.tenor import TenorClient, TenorUnavailable
+
+log = get_logger(__name__)
+
+GIF_CHOICES = {"splatoon": "Splatoon", "pikmin": "Pikmin"}
+# Served GIFs are written out at most this often, so a crash doesn't bring back many of them on restart
+SNAPSHOT_DELAY = 30
 
 
 class GifCog(commands.Cog):
-    def __init__(self, bot):
+    def __init__(self, bot, low_watermark=10, related_terms_ttl=3600, gif_ttl=86400):
         self.bot = bot
         self.api_key = bot.tenor_api_key
         self.ckey = "my_test_app"
         if not self.api_key:
             raise ValueError("TENOR_API_KEY not found in environment variables")
+        self.tenor = TenorClient(self.api_key, self.ckey, bot.tenor_base_url)
+        self.low_watermark = low_watermark
+        self.related_terms_ttl = related_terms_ttl
+        self.gif_ttl = gif_ttl
+        self.cache_file = bot.gif_cache_file
+        self.related_terms = {}
+        self.pools = {choice: collections.deque() for choice in GIF_CHOICES}
+        self.refills = {}
+        self.term_refreshes = {}
+        self.snapshot_task = None
+        self.handed_off = False
+        state = bot.handoff.get(self.qualified_name)
+        if state:
+            self.pools.update(state["pools"])
+            self.related_terms = state["related_terms"]
+            self.handed_off = True
+        self.stats = {"hits": 0, "misses": 0, "refills": 0, "refill_errors": 0, "last_refill_ms": 0.0,
+                      "total_refill_ms": 0.0}
+
+    async def cog_load(self):
+        await self.tenor.start()
+        if not self.handed_off:
+            await asyncio.to_thread(self.load_cache)
+        for choice in GIF_CHOICES:
+            self.ensure_refill(choice)
+        self.bot.handoff.pop(self.qualified_name, None)
+
+    async def cog_unload(self):
+        for task in [*self.refills.values(), *self.term_refreshes.values(), self.snapshot_task]:
+            if task:
+                task.cancel()
+        await self.save_cache()
+        await self.tenor.close()
+
+    def export_state(self):
+        return {"pools": self.pools, "related_terms": self.related_terms}
+
+    def load_cache(self):
+        try:
+            with open(self.cache_file, "r") as f:
+                cache = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+
+        now = time.time()
+        for choice, gifs in cache.get("pools", {}).items():
+            if choice in self.pools:
+                self.pools[choice].extend((url, expires) for url, expires in gifs if expires > now)
+        # Stale related terms are still served while they refresh in the background
+        self.related_terms.update({term: (expires, terms) for term, (expires, terms) in
+                                   cache.get("related_terms", {}).items()})
+
+    async def save_cache(self):
+        cache = {
+            "pools": {choice: list(pool) for choice, pool in self.pools.items()},
+            "related_terms": self.related_terms.copy(),
+        }
+        try:
+            await asyncio.to_thread(JSONStorage.write_atomic, self.cache_file, cache)
+        except OSError as err:
+            log.warning("Error saving GIF cache: %s", err)
+
+    def schedule_snapshot(self, delay=0):
+        # A snapshot already waiting to be written picks up this change too
+        if self.snapshot_task is None or self.snapshot_task.done():
+            self.snapshot_task = asyncio.create_task(self.save_cache_after(delay))
+
+    async def save_cache_after(self, delay):
+        await asyncio.sleep(delay)
+        await self.save_cache()
 
     async def get_related_terms(self, search_term):
-        url = f"https://tenor.googleapis.com/v2/search_suggestions?q={search_term}&key={self.api_key}&client_key={self.ckey}"
+        cached = self.related_terms.get(search_term)
+        if cached:
+            if cached[0] <= time.time() and search_term not in self.term_refreshes:
+                task = asyncio.create_task(self.refresh_related_terms(search_term))
+                self.term_refreshes[search_term] = task
+                task.add_done_callback(lambda _: self.term_refreshes.pop(search_term, None))
+            return cached[1]
 
-        async with self.bot.session.get(url) as response:
-            if response.status == 200:
-                data = await response.json()
-                return data.get('results', [])
-            else:
-                print(f"Error fetching related terms: {response.status}")
-                return []
+        return await self.refresh_related_terms(search_term)
 
-    async def get_random_gif(self, initial_search_term):
+    async def refresh_related_terms(self, search_term):
+        try:
+            terms = await self.tenor.search_suggestions(search_term)
+        except TenorUnavailable as err:
+            log.warning("Error fetching related terms for %r: %s", search_term, err)
+            return []
+        self.related_terms[search_term] = (time.time() + self.related_terms_ttl, terms)
+        return terms
+
+    async def fetch_gifs(self, initial_search_term):
         related_terms = await self.get_related_terms(initial_search_term)
         all_terms = [initial_search_term] + related_terms
         search_term = random.choice(all_terms)
@@ -33,33 +124,70 @@ class GifCog(commands.Cog):
         max_count = 1000
         random_start = random.randint(0, max_count - limit)
 
-        # Add a random query parameter to prevent caching
-        random_param = f"nocache={int(time.time())}"
-
-        url = f"https://tenor.googleapis.com/v2/search?q={search_term}&key={self.api_key}&client_key={self.ckey}&limit={limit}&pos={random_start}&{random_param}"
-
-        async with self.bot.session.get(url) as response:
-            if response.status == 200:
-                data = await response.json()
-                results = data.get('results', [])
-
-                if results:
-                    # Choose a random GIF from the results
-                    random_gif = random.choice(results)
-                    return random_gif['media_formats']['gif']['url']
-                else:
-                    return None
-            else:
-                print(f"Error {response.status}: {await response.text()}")
-                return None
-
-    @app_commands.command(name='randomgif', description="Generate a random splatoon or pikmin gif")
-    @app_commands.choices(choice=[
-        app_commands.Choice(name='Splatoon', value='splatoon'),
-        app_commands.Choice(name='Pikmin', value='pikmin')
-    ])
+        try:
+            # Requests for the same term already in flight share that page, so the random start only applies to the
+            # first of them; callers still choose their own GIF from it
+            return await self.tenor.search(search_term, limit=limit, pos=random_start)
+        except TenorUnavailable as err:
+            log.warning("Error fetching GIFs for %r: %s", search_term, err)
+            return []
+
+    async def get_random_gif(self, initial_search_term):
+        gifs = await self.fetch_gifs(initial_search_term)
+        # Choose a random GIF from the results
+        return random.choice(gifs) if gifs else None
+
+    def drop_expired(self, choice):
+        pool = self.pools[choice]
+        now = time.time()
+        while pool and pool[0][1] <= now:
+            pool.popleft()
+        return pool
+
+    def ensure_refill(self, choice):
+        refilling = choice in self.refills and not self.refills[choice].done()
+        if len(self.drop_expired(choice)) < self.low_watermark and not refilling:
+            self.refills[choice] = asyncio.create_task(self.refill(choice))
+
+    async def refill(self, choice):
+        pool = self.pools[choice]
+        attempts = 0
+        while len(pool) < self.low_watermark and attempts < 3:
+            attempts += 1
+            started = time.perf_counter()
+            try:
+                gifs = await self.fetch_gifs(choice)
+            except Exception:
+                self.stats["refill_errors"] += 1
+                log.exception("Error refilling %s GIF pool", choice)
+                continue
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stats["refills"] += 1
+            self.stats["last_refill_ms"] = elapsed
+            self.stats["total_refill_ms"] += elapsed
+
+            known = {url for url, _ in pool}
+            gifs = [gif for gif in gifs if gif not in known]
+            random.shuffle(gifs)
+            expires = time.time() + self.gif_ttl
+            pool.extend((gif, expires) for gif in gifs)
+        self.schedule_snapshot()
+
+    @app_commands.command(name='randomgif', description="Generate a random splatoon or pikmin gif",
+                          extras={"defer_ephemeral": False})
+    @app_commands.choices(choice=[app_commands.Choice(name=name, value=value) for value, name in GIF_CHOICES.items()])
     async def random_gif(self, interaction: discord.Interaction, choice: app_commands.Choice[str]):
-        gif_url = await self.get_random_gif(choice.value)
+        pool = self.drop_expired(choice.value)
+        if pool:
+            self.stats["hits"] += 1
+            gif_url, _ = pool.popleft()
+            self.schedule_snapshot(SNAPSHOT_DELAY)
+        else:
+            self.stats["misses"] += 1
+            interaction_logger(log, interaction).info("%s GIF pool empty, fetching directly", choice.value)
+            gif_url = await self.get_random_gif(choice.value)
+        self.ensure_refill(choice.value)
+
         if gif_url:
             await interaction.response.send_message(gif_url)
         else:
@@ -68,4 +196,4 @@ class GifCog(commands.Cog):
 
 async def setup(bot):
     await bot.add_cog(GifCog(bot))
-    print("- random_gif.py loaded -")
\ No newline at end of file
+    log.info("random_gif.py loaded")
@@ -3,25 +3,332 @@ from discord.ext import commands
 from discord import app_commands
 import datetime
 import asyncio
-import json
+import bisect
+import heapq
+import math
+import time
+from utils.clock import seconds_until_midnight
+from utils.logs import get_logger
+
+log = get_logger(__name__)
+
+TASKS_PER_PAGE = 10
+# Reminders being sent at once; the outbound dispatcher paces the requests themselves
+MAX_CONCURRENT_REMINDERS = 50
+# How long unloading waits for reminders already being sent
+UNLOAD_TIMEOUT = 10
+# Task IDs reserved from storage at a time
+TASK_ID_BLOCK = 100
+
+
+class Task:
+    # Dates are kept as a day ordinal and an epoch second so the scheduler never reparses strings
+    __slots__ = ("id", "task", "due", "ignored_until")
+
+    def __init__(self, task_id, task, due, ignored_until=None):
+        self.id = task_id
+        self.task = task
+        self.due = due
+        self.ignored_until = ignored_until
+
+    @property
+    def due_date(self):
+        return datetime.date.fromordinal(self.due)
+
+    @classmethod
+    def from_dict(cls, data, default_id):
+        ignored_until = data.get("ignored_until")
+        # Older saves wrote a naive local time, which is ambiguous across a DST change, so it's only read
+        if isinstance(ignored_until, str):
+            ignored_until = int(datetime.datetime.fromisoformat(ignored_until).timestamp())
+        return cls(data.get("id", default_id), data["task"], datetime.date.fromisoformat(data["due_date"]).toordinal(),
+                   ignored_until)
+
+    def to_dict(self):
+        return {"id": self.id, "task": self.task, "due_date": self.due_date.isoformat(),
+                "ignored_until": self.ignored_until}
+
+    @classmethod
+    def records(cls, task_dicts):
+        # Tasks saved before they had IDs are numbered in their stored order
+        return {task.id: task for task in (cls.from_dict(data, i) for i, data in enumerate(task_dicts, 1))}
 
 
 class TaskReminder(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.tasks = {}
-        self.load_tasks()
+        self.persistence = bot.persistence
+        self.reminder_hour = bot.reminder_hour
+        self.reminder_cooldown = bot.reminder_cooldown
+        self.next_eligible = {}
+        # Fallback channels only live in memory, so they are handed over on /reload along with everything else.
+        # Cooldowns are stored too, so a restart doesn't remind everyone with a task due all over again.
+        state = bot.handoff.get(self.qualified_name)
+        if state:
+            self.tasks = {user_id: Task.records(tasks) for user_id, tasks in state["tasks"].items()}
+            self.last_reminded = state["last_reminded"]
+            self.last_channels = state["last_channels"]
+            self.next_task_id, self.task_ids_end = state["task_ids"]
+        else:
+            self.tasks = {user_id: Task.records(tasks) for user_id, tasks in bot.storage.load_tasks().items()}
+            self.last_reminded = bot.storage.load_last_reminded()
+            self.last_channels = {}
+            # IDs are only unique per user, but they come from a counter kept in storage, so a removed task's ID
+            # isn't handed out again after a restart and processes sharing the database never hand out the same one
+            self.next_task_id = self.task_ids_end = 0
+        self.reserving_task_ids = asyncio.Lock()
+        # Each user's (due, id) pairs in due date order, and the /view_tasks pages rendered from them
+        self.due_index = {user_id: self.sorted_index(user_tasks) for user_id, user_tasks in self.tasks.items()}
+        self.page_cache = {}
+        self.schedule = []
+        self.scheduled = {}
+        self.schedule_changed = asyncio.Event()
+        self.rollover_task = None
+        self.scheduler_task = None
+        self.reminder_slots = asyncio.Semaphore(MAX_CONCURRENT_REMINDERS)
+        self.reminders_in_flight = set()
+        self.rebuild_eligibility()
+
+    async def cog_load(self):
+        self.rollover_task = asyncio.create_task(self.rollover())
+        # In cluster mode only the primary process sends reminders, so users aren't reminded once per process
+        if self.bot.is_primary:
+            self.scheduler_task = asyncio.create_task(self.run_scheduler())
+        self.bot.handoff.pop(self.qualified_name, None)
+
+    async def cog_unload(self):
+        for task in (self.rollover_task, self.scheduler_task):
+            if task:
+                task.cancel()
+        # Reminders already on their way are let finish, so a /reload or shutdown doesn't drop them
+        if self.reminders_in_flight:
+            _, pending = await asyncio.wait(set(self.reminders_in_flight), timeout=UNLOAD_TIMEOUT)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        self.bot.remove_dynamic_items(ReminderButton, TaskPageButton)
+
+    def export_state(self):
+        # Tasks go over as plain records, so the reloaded module rebuilds them with its own Task class
+        tasks = {user_id: [task.to_dict() for task in user_tasks.values()]
+                 for user_id, user_tasks in self.tasks.items()}
+        return {"tasks": tasks, "last_reminded": self.last_reminded, "last_channels": self.last_channels,
+                "task_ids": (self.next_task_id, self.task_ids_end)}
+
+    async def new_task_id(self):
+        if self.next_task_id >= self.task_ids_end:
+            async with self.reserving_task_ids:
+                # Callers that waited on another's reservation take from the block it got
+                if self.next_task_id >= self.task_ids_end:
+                    first = await self.persistence.read(self.bot.storage.reserve_task_ids, TASK_ID_BLOCK)
+                    self.next_task_id, self.task_ids_end = first, first + TASK_ID_BLOCK
+        task_id = self.next_task_id
+        self.next_task_id += 1
+        return task_id
+
+    @staticmethod
+    def sorted_index(user_tasks):
+        return sorted((task.due, task.id) for task in user_tasks.values())
+
+    def add_task_record(self, user_id, task):
+        self.tasks.setdefault(user_id, {})[task.id] = task
+        bisect.insort(self.due_index.setdefault(user_id, []), (task.due, task.id))
+
+    def remove_task_record(self, user_id, task_id):
+        task = self.tasks.get(user_id, {}).pop(task_id, None)
+        if task is not None:
+            index = self.due_index[user_id]
+            del index[bisect.bisect_left(index, (task.due, task.id))]
+        return task
+
+    def save_tasks(self, user_id, saved=(), removed=()):
+        # Only the tasks that changed are written, so processes sharing the database don't overwrite each other's
+        # changes to the same user's other tasks
+        for task in saved:
+            self.persistence.set_task(user_id, task.to_dict())
+        for task_id in removed:
+            self.persistence.delete_task(user_id, task_id)
+        if not self.tasks.get(user_id):
+            self.tasks.pop(user_id, None)
+            self.due_index.pop(user_id, None)
+        self.page_cache.pop(user_id, None)
+        self.update_eligibility(user_id)
+
+    async def apply_remote_change(self, kind, guild_id, user_id):
+        if kind != "tasks":
+            return
+        user_tasks = Task.records(await self.persistence.read(self.bot.storage.get_tasks, user_id))
+        # Local changes that haven't been written yet are newer than what was just read
+        local_tasks = self.tasks.get(user_id, {})
+        for task_id in self.persistence.pending_task_ids(user_id):
+            if task_id in local_tasks:
+                user_tasks[task_id] = local_tasks[task_id]
+            else:
+                user_tasks.pop(task_id, None)
+        if user_tasks:
+            self.tasks[user_id] = user_tasks
+            self.due_index[user_id] = self.sorted_index(user_tasks)
+        else:
+            self.tasks.pop(user_id, None)
+            self.due_index.pop(user_id, None)
+        self.page_cache.pop(user_id, None)
+        self.update_eligibility(user_id)
+
+    @staticmethod
+    def midnight_timestamp(day):
+        return datetime.datetime.combine(day, datetime.time()).timestamp()
+
+    def next_reminder_slot(self, timestamp):
+        day = datetime.datetime.fromtimestamp(timestamp).date()
+        slot = datetime.datetime.combine(day, datetime.time(self.reminder_hour)).timestamp()
+        return slot if slot > timestamp else slot + 86400
+
+    def update_eligibility(self, user_id, today=None):
+        # Earliest epoch second at which one of the user's tasks is inside its 5 day window and not ignored.
+        # A task that was already reminded about waits for the next daily slot unless it was ignored since.
+        today = today or datetime.date.today()
+        last_reminded = self.last_reminded.get(user_id)
+        next_eligible = None
+        today = today.toordinal()
+        for task in self.tasks.get(user_id, {}).values():
+            if task.due < today:
+                continue
+            eligible = self.midnight_timestamp(datetime.date.fromordinal(task.due - 5)) + self.reminder_hour * 3600
+            if task.ignored_until:
+                eligible = max(eligible, task.ignored_until)
+            if last_reminded is not None and eligible <= last_reminded:
+                eligible = self.next_reminder_slot(last_reminded)
+            if eligible < self.midnight_timestamp(datetime.date.fromordinal(task.due + 1)):
+                next_eligible = eligible if next_eligible is None else min(next_eligible, eligible)
+
+        if next_eligible is None:
+            self.next_eligible.pop(user_id, None)
+            self.scheduled.pop(user_id, None)
+            return
 
-    def load_tasks(self):
+        if last_reminded is not None:
+            next_eligible = max(next_eligible, last_reminded + self.reminder_cooldown)
+        self.next_eligible[user_id] = math.ceil(next_eligible)
+        self.schedule_reminder(user_id, self.next_eligible[user_id])
+
+    def rebuild_eligibility(self):
+        today = datetime.date.today()
+        self.next_eligible = {}
+        self.schedule = []
+        self.scheduled = {}
+        for user_id in self.tasks:
+            self.update_eligibility(user_id, today)
+        self.schedule_changed.set()
+
+    def schedule_reminder(self, user_id, when):
+        if self.scheduled.get(user_id) == when:
+            return
+        # Superseded heap entries are skipped when popped
+        self.scheduled[user_id] = when
+        heapq.heappush(self.schedule, (when, user_id))
+        if self.schedule[0] == (when, user_id):
+            self.schedule_changed.set()
+
+    async def run_scheduler(self):
+        await self.bot.wait_until_ready()
+        while True:
+            self.schedule_changed.clear()
+            now = time.time()
+            while self.schedule and self.schedule[0][0] <= now:
+                when, user_id = heapq.heappop(self.schedule)
+                if self.scheduled.get(user_id) != when:
+                    continue
+                del self.scheduled[user_id]
+                # Not awaited one by one, so a large batch goes out as fast as the dispatcher's budget allows
+                await self.reminder_slots.acquire()
+                task = asyncio.create_task(self.fire_reminder(user_id))
+                self.reminders_in_flight.add(task)
+                task.add_done_callback(lambda task, user_id=user_id: self.reminder_done(user_id, task))
+
+            timeout = self.schedule[0][0] - time.time() if self.schedule else None
+            try:
+                await asyncio.wait_for(self.schedule_changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def reminder_done(self, user_id, task):
+        self.reminder_slots.release()
+        self.reminders_in_flight.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.bind(user_id=user_id).error("Error sending task reminder", exc_info=task.exception())
+
+    def tasks_due_between(self, user_id, first_day, last_day):
+        # Soonest first, straight from the due date index
+        index = self.due_index.get(user_id, [])
+        user_tasks = self.tasks[user_id] if index else {}
+        start = bisect.bisect_left(index, (first_day,))
+        end = bisect.bisect_left(index, (last_day + 1,))
+        return [user_tasks[task_id] for _, task_id in index[start:end]]
+
+    def tasks_to_remind(self, user_id):
+        today = datetime.date.today().toordinal()
+        now = time.time()
+        return [(task, task.due - today) for task in self.tasks_due_between(user_id, today, today + 5)
+                if task.ignored_until is None or now > task.ignored_until]
+
+    async def fire_reminder(self, user_id):
+        tasks_to_remind = self.tasks_to_remind(user_id)
         try:
-            with open('tasks.json', 'r') as f:
-                self.tasks = json.load(f)
-        except FileNotFoundError:
-            self.tasks = {}
-
-    def save_tasks(self):
-        with open('tasks.json', 'w') as f:
-            json.dump(self.tasks, f)
+            if tasks_to_remind:
+                # Marked straight away so the user isn't rescheduled while the DM is on its way, but only stored
+                # once it has been sent
+                previous = self.last_reminded.get(user_id)
+                self.last_reminded[user_id] = time.time()
+                try:
+                    await self.send_reminder(int(user_id), tasks_to_remind)
+                except asyncio.CancelledError:
+                    if previous is None:
+                        self.last_reminded.pop(user_id, None)
+                    else:
+                        self.last_reminded[user_id] = previous
+                    raise
+                self.persistence.set_last_reminded(user_id, self.last_reminded[user_id])
+        finally:
+            self.update_eligibility(user_id)
+
+    async def rollover(self):
+        while True:
+            await asyncio.sleep(seconds_until_midnight() + 1)
+            # Rendered pages say how many days are left, so they go stale at midnight
+            self.page_cache.clear()
+            self.rebuild_eligibility()
+
+    def page_count(self, user_id):
+        return max(1, math.ceil(len(self.due_index.get(user_id, ())) / TASKS_PER_PAGE))
+
+    def task_page(self, user_id, page):
+        # Rendered on demand and memoized until the user's tasks change or the day rolls over
+        pages = self.page_cache.setdefault(user_id, {})
+        if page not in pages:
+            today = datetime.date.today().toordinal()
+            user_tasks = self.tasks.get(user_id, {})
+            fields = []
+            for due, task_id in self.due_index.get(user_id, [])[page * TASKS_PER_PAGE:(page + 1) * TASKS_PER_PAGE]:
+                days_left = due - today
+                if days_left < 0:
+                    status = "Overdue"
+                elif days_left == 0:
+                    status = "Due today"
+                else:
+                    status = f"{days_left} day{'s' if days_left != 1 else ''} left"
+                task = user_tasks[task_id]
+                fields.append((task.task[:256], f"Due: {task.due_date.isoformat()} ({status})"))
+            pages[page] = fields
+        return pages[page]
+
+    def task_embed(self, title, user_id, page):
+        embed = discord.Embed(title=title, color=discord.Color.blue())
+        for name, value in self.task_page(user_id, page):
+            embed.add_field(name=name, value=value, inline=False)
+        page_count = self.page_count(user_id)
+        if page_count > 1:
+            embed.set_footer(text=f"Page {page + 1}/{page_count}")
+        return embed
 
     @app_commands.command(name="add_task", description="Add a new task with a due date")
     @app_commands.describe(
@@ -47,11 +354,9 @@ class TaskReminder(commands.Cog):
             return
 
         user_id = str(interaction.user.id)
-        if user_id not in self.tasks:
-            self.tasks[user_id] = []
-
-        self.tasks[user_id].append({"task": task, "due_date": due_date.isoformat(), "ignored_until": None})
-        self.save_tasks()
+        new_task = Task(await self.new_task_id(), task, due_date.toordinal())
+        self.add_task_record(user_id, new_task)
+        self.save_tasks(user_id, saved=[new_task])
 
         await interaction.response.send_message(f"Task '{task}' added with due date {due_date.strftime('%B %d, %Y')}.",
                                                 ephemeral=True)
@@ -67,58 +372,47 @@ class TaskReminder(commands.Cog):
             await interaction.response.send_message(f"No tasks found for {member.display_name}.", ephemeral=True)
             return
 
-        embed = discord.Embed(title=f"Tasks for {member.display_name}", color=discord.Color.blue())
-
-        for task in self.tasks[user_id]:
-            due_date = datetime.date.fromisoformat(task['due_date'])
-            days_left = (due_date - datetime.date.today()).days
-
-            if days_left < 0:
-                status = "Overdue"
-            elif days_left == 0:
-                status = "Due today"
-            else:
-                status = f"{days_left} day{'s' if days_left != 1 else ''} left"
-
-            embed.add_field(name=task['task'], value=f"Due: {task['due_date']} ({status})", inline=False)
-
-        await interaction.response.send_message(embed=embed)
+        embed = self.task_embed(f"Tasks for {member.display_name}", user_id, 0)
+        page_count = self.page_count(user_id)
+        if page_count > 1:
+            await interaction.response.send_message(embed=embed,
+                                                    view=TaskPageView(user_id, interaction.user.id, 0, page_count))
+        else:
+            await interaction.response.send_message(embed=embed)
 
     @commands.Cog.listener()
     async def on_message(self, message):
         if message.author.bot:
             return
 
+        # Reminders are sent by the scheduler; messages only remember where to fall back to if DMs are closed
         user_id = str(message.author.id)
-        if user_id not in self.tasks:
-            return
-
-        tasks_to_remind = []
-        for task in self.tasks[user_id]:
-            due_date = datetime.date.fromisoformat(task['due_date'])
-            days_left = (due_date - datetime.date.today()).days
-            ignored_until = task.get('ignored_until')
-
-            if 0 <= days_left <= 5 and (
-                    ignored_until is None or datetime.datetime.now() > datetime.datetime.fromisoformat(ignored_until)):
-                tasks_to_remind.append((task['task'], days_left))
+        if user_id in self.next_eligible:
+            self.last_channels[user_id] = message.channel.id
 
-        if tasks_to_remind:
-            await self.send_reminder(message.author, tasks_to_remind)
-
-    async def send_reminder(self, user, tasks):
+    async def send_reminder(self, user_id, tasks):
         embed = discord.Embed(title="Task Reminders", color=discord.Color.blue())
         for task, days_left in tasks:
-            embed.add_field(name=task, value=f"{days_left} day{'s' if days_left != 1 else ''} left", inline=False)
+            embed.add_field(name=task.task, value=f"{days_left} day{'s' if days_left != 1 else ''} left", inline=False)
 
-        view = ReminderView(self, user.id, [task for task, _ in tasks])
+        view = ReminderView(user_id, [task.id for task, _ in tasks])
         try:
-            await user.send(f"You have upcoming tasks!", embed=embed, view=view)
+            await self.bot.outbound.send(f"dm:{user_id}", lambda: self.send_dm(user_id, embed, view))
         except discord.Forbidden:
             # If DM is not possible, send to the last channel the user messaged in
-            channel = self.bot.get_channel(user.last_message.channel.id)
-            await channel.send(f"{user.mention}, I couldn't send you a DM. Here are your task reminders:", embed=embed,
-                               view=view)
+            channel = self.bot.get_channel(self.last_channels.get(str(user_id), 0))
+            if channel is None:
+                log.bind(user_id=user_id).info("Can't DM user and no fallback channel is known, skipping reminder")
+                return
+            await self.bot.outbound.send(
+                f"channel:{channel.id}",
+                lambda: channel.send(f"<@{user_id}>, I couldn't send you a DM. Here are your task reminders:",
+                                     embed=embed, view=view))
+
+    async def send_dm(self, user_id, embed, view):
+        # Opening the DM only needs the ID, so users missing from the lean user cache don't cost a fetch_user too
+        channel = await self.bot.create_dm(discord.Object(id=user_id))
+        return await channel.send("You have upcoming tasks!", embed=embed, view=view)
 
     @app_commands.command(name="remove_task", description="Remove one of your tasks (Good job for finishing it!)")
     async def delete_task(self, interaction: discord.Interaction):
@@ -127,19 +421,22 @@ class TaskReminder(commands.Cog):
             await interaction.response.send_message("You have no tasks to remove.", ephemeral=True)
             return
 
+        # A select menu holds at most 25 options, so offer the soonest due
+        user_tasks = self.tasks[user_id]
         options = [
-            discord.SelectOption(label=task['task'][:100], value=str(i))  # Truncate task name if too long
-            for i, task in enumerate(self.tasks[user_id])
+            discord.SelectOption(label=user_tasks[task_id].task[:100], value=str(task_id))  # Truncate long names
+            for _, task_id in self.due_index[user_id][:25]
         ]
 
-        view = TaskSelectView(self, user_id, options)
+        view = TaskSelectView(user_id, options)
         await interaction.response.send_message("Select a task to remove:", view=view, ephemeral=True)
 
 
+# These views outlive a /reload of this cog, so they look it up when used rather than keeping the instance that
+# created them
 class TaskSelectView(discord.ui.View):
-    def __init__(self, cog, user_id, options):
+    def __init__(self, user_id, options):
         super().__init__()
-        self.cog = cog
         self.user_id = user_id
         self.add_item(TaskSelect(options))
 
@@ -150,54 +447,50 @@ class TaskSelect(discord.ui.Select):
 
     async def callback(self, interaction: discord.Interaction):
         view: TaskSelectView = self.view
-        selected_task_index = int(self.values[0])
-        selected_task = view.cog.tasks[view.user_id][selected_task_index]
-
-        del view.cog.tasks[view.user_id][selected_task_index]
-        if not view.cog.tasks[view.user_id]:
-            del view.cog.tasks[view.user_id]
-        view.cog.save_tasks()
+        cog = interaction.client.get_cog("TaskReminder")
+        selected_task = cog.remove_task_record(view.user_id, int(self.values[0]))
+        if selected_task is None:
+            await interaction.response.edit_message(content="That task was already removed.", view=None)
+            return
+        cog.save_tasks(view.user_id, removed=[selected_task.id])
 
-        add_back_view = AddBackView(view.cog, view.user_id, selected_task)
+        add_back_view = AddBackView(view.user_id, selected_task)
         await interaction.response.edit_message(
-            content=f"Task '{selected_task['task']}' was removed.",
+            content=f"Task '{selected_task.task}' was removed.",
             view=add_back_view
         )
 
 
 class AddBackView(discord.ui.View):
-    def __init__(self, cog, user_id, task):
+    def __init__(self, user_id, task):
         super().__init__()
-        self.cog = cog
         self.user_id = user_id
         self.task = task
-        self.add_item(AddBackButton(cog, user_id, task))
+        self.add_item(AddBackButton(user_id, task))
 
 
 class AddBackButton(discord.ui.Button):
-    def __init__(self, cog, user_id, task):
+    def __init__(self, user_id, task):
         super().__init__(style=discord.ButtonStyle.success, label="Add it back")
-        self.cog = cog
         self.user_id = user_id
         self.task = task
 
     async def callback(self, interaction: discord.Interaction):
-        if self.user_id not in self.cog.tasks:
-            self.cog.tasks[self.user_id] = []
-        self.cog.tasks[self.user_id].append(self.task)
-        self.cog.save_tasks()
+        cog = interaction.client.get_cog("TaskReminder")
+        if self.task.id not in cog.tasks.get(self.user_id, {}):
+            cog.add_task_record(self.user_id, self.task)
+        cog.save_tasks(self.user_id, saved=[self.task])
 
         await interaction.response.edit_message(
-            content=f"Task '{self.task['task']}' has been added back.",
+            content=f"Task '{self.task.task}' has been added back.",
             view=None
         )
 
 
 class DeleteTaskView(discord.ui.View):
-    def __init__(self, cog, user_id, options):
+    def __init__(self, user_id, options):
         super().__init__()
         self.selected_task = None
-        self.cog = cog
         self.user_id = user_id
         self.add_item(SelectTask(options))
 
@@ -207,10 +500,9 @@ class DeleteTaskView(discord.ui.View):
             await interaction.response.send_message("Please select a task first.", ephemeral=True)
             return
 
-        del self.cog.tasks[self.user_id][self.selected_task]
-        if not self.cog.tasks[self.user_id]:
-            del self.cog.tasks[self.user_id]
-        self.cog.save_tasks()
+        cog = interaction.client.get_cog("TaskReminder")
+        cog.remove_task_record(self.user_id, self.selected_task)
+        cog.save_tasks(self.user_id, removed=[self.selected_task])
 
         await interaction.response.send_message("Task removed successfully.", ephemeral=True)
         self.stop()
@@ -227,53 +519,139 @@ class SelectTask(discord.ui.Select):
                                                 ephemeral=True)
 
 
-class ReminderView(discord.ui.View):
-    def __init__(self, cog, user_id, tasks):
+class TaskPageView(discord.ui.View):
+    def __init__(self, user_id, viewer_id, page, page_count):
         super().__init__(timeout=None)
-        self.cog = cog
-        self.user_id = user_id
-        self.tasks = tasks
+        previous_button = TaskPageButton("previous", user_id, viewer_id, page)
+        previous_button.item.disabled = page == 0
+        next_button = TaskPageButton("next", user_id, viewer_id, page)
+        next_button.item.disabled = page >= page_count - 1
+        self.add_item(previous_button)
+        self.add_item(next_button)
+
+
+class TaskPageButton(discord.ui.DynamicItem[discord.ui.Button],
+                     template=r"tasks:(?P<action>previous|next):(?P<user_id>\d+):(?P<viewer_id>\d+):(?P<page>\d+)"):
+    labels = {"previous": "Previous", "next": "Next"}
+
+    def __init__(self, action, user_id, viewer_id, page):
+        super().__init__(discord.ui.Button(label=self.labels[action], style=discord.ButtonStyle.gray,
+                                           custom_id=f"tasks:{action}:{user_id}:{viewer_id}:{page}"))
+        self.action = action
+        self.user_id = str(user_id)
+        self.viewer_id = int(viewer_id)
+        self.page = page
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["action"], match["user_id"], match["viewer_id"], int(match["page"]))
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        if interaction.user.id != self.viewer_id:
+            await interaction.response.send_message("Run /view_tasks to page through the tasks yourself.",
+                                                    ephemeral=True)
+            return False
+        return True
 
-    @discord.ui.button(label="Ignore for 1 hour", style=discord.ButtonStyle.secondary)
-    async def ignore_hour_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if interaction.user.id != self.user_id:
-            await interaction.response.send_message("This button is not for you.", ephemeral=True)
+    async def callback(self, interaction: discord.Interaction):
+        cog = interaction.client.get_cog("TaskReminder")
+        if not cog.tasks.get(self.user_id):
+            await interaction.response.edit_message(content="No tasks left.", embed=None, view=None)
             return
 
-        ignored_until = datetime.datetime.now() + datetime.timedelta(hours=1)
-        for task in self.cog.tasks[str(self.user_id)]:
-            if task['task'] in self.tasks:
-                task['ignored_until'] = ignored_until.isoformat()
+        page_count = cog.page_count(self.user_id)
+        page = self.page - 1 if self.action == "previous" else self.page + 1
+        page = min(max(page, 0), page_count - 1)
+        embeds = interaction.message.embeds
+        title = embeds[0].title if embeds else "Tasks"
+        await interaction.response.edit_message(embed=cog.task_embed(title, self.user_id, page),
+                                                view=TaskPageView(self.user_id, self.viewer_id, page, page_count))
 
-        self.cog.save_tasks()
-        await interaction.response.send_message("Tasks ignored for the next hour.", ephemeral=True)
 
-    @discord.ui.button(label="Ignore for today", style=discord.ButtonStyle.secondary)
-    async def ignore_day_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+class ReminderView(discord.ui.View):
+    def __init__(self, user_id, task_ids):
+        super().__init__(timeout=None)
+        ids = ReminderButton.encode_ids(task_ids, user_id)
+        for action in ReminderButton.labels:
+            self.add_item(ReminderButton(action, user_id, ids))
+
+
+class ReminderButton(discord.ui.DynamicItem[discord.ui.Button],
+                     template=r"reminder:(?P<action>ignore_hour|ignore_day|done):(?P<user_id>\d+):"
+                              r"t(?P<ids>[0-9a-z.]+)"):
+    labels = {
+        "ignore_hour": ("Ignore for 1 hour", discord.ButtonStyle.secondary),
+        "ignore_day": ("Ignore for today", discord.ButtonStyle.secondary),
+        "done": ("Mark as done", discord.ButtonStyle.success),
+    }
+
+    def __init__(self, action, user_id, ids):
+        label, style = self.labels[action]
+        super().__init__(discord.ui.Button(label=label, style=style, custom_id=f"reminder:{action}:{user_id}:t{ids}"))
+        self.action = action
+        self.user_id = int(user_id)
+        self.ids = ids
+
+    @staticmethod
+    def encode_ids(task_ids, user_id):
+        # Base 36 IDs, keeping as many of the (soonest due) tasks as fit in the 100 character custom_id
+        room = 100 - len(f"reminder:ignore_hour:{user_id}:t")
+        ids = ""
+        for task_id in task_ids:
+            encoded = f"{ids}.{base36(task_id)}" if ids else base36(task_id)
+            if len(encoded) > room:
+                break
+            ids = encoded
+        return ids
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["action"], match["user_id"], match["ids"])
+
+    async def interaction_check(self, interaction: discord.Interaction):
         if interaction.user.id != self.user_id:
             await interaction.response.send_message("This button is not for you.", ephemeral=True)
+            return False
+        return True
+
+    async def callback(self, interaction: discord.Interaction):
+        cog = interaction.client.get_cog("TaskReminder")
+        user_id = str(self.user_id)
+        user_tasks = cog.tasks.get(user_id, {})
+        task_ids = (int(task_id, 36) for task_id in self.ids.split("."))
+        tasks = [user_tasks[task_id] for task_id in task_ids if task_id in user_tasks]
+
+        if self.action == "done":
+            for task in tasks:
+                cog.remove_task_record(user_id, task.id)
+            cog.save_tasks(user_id, removed=[task.id for task in tasks])
+            await interaction.response.send_message("Tasks marked as done and removed from reminders.", ephemeral=True)
             return
 
-        ignored_until = datetime.datetime.now() + datetime.timedelta(days=1)
-        for task in self.cog.tasks[str(self.user_id)]:
-            if task['task'] in self.tasks:
-                task['ignored_until'] = ignored_until.isoformat()
+        if self.action == "ignore_hour":
+            ignored_until = int(time.time()) + 3600
+            message = "Tasks ignored for the next hour."
+        else:
+            ignored_until = int(time.time()) + 86400
+            message = "Tasks ignored for the next 24 hours."
 
-        self.cog.save_tasks()
-        await interaction.response.send_message("Tasks ignored for the next 24 hours.", ephemeral=True)
+        for task in tasks:
+            task.ignored_until = ignored_until
+
+        cog.save_tasks(user_id, saved=tasks)
+        await interaction.response.send_message(message, ephemeral=True)
 
-    @discord.ui.button(label="Mark as done", style=discord.ButtonStyle.success)
-    async def done_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if interaction.user.id != self.user_id:
-            await interaction.response.send_message("This button is not for you.", ephemeral=True)
-            return
 
-        user_tasks = self.cog.tasks[str(self.user_id)]
-        self.cog.tasks[str(self.user_id)] = [task for task in user_tasks if task['task'] not in self.tasks]
-        self.cog.save_tasks()
-        await interaction.response.send_message("Tasks marked as done and removed from reminders.", ephemeral=True)
+def base36(number):
+    digits = ""
+    while True:
+        number, digit = divmod(number, 36)
+        digits = "0123456789abcdefghijklmnopqrstuvwxyz"[digit] + digits
+        if not number:
+            return digits
 
 
 async def setup(bot):
+    bot.add_dynamic_items(ReminderButton, TaskPageButton)
     await bot.add_cog(TaskReminder(bot))
-    print("- task_reminder.py loaded - ")
+    log.info("task_reminder.py loaded")
@@ -0,0 +1,103 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+
+import aiohttp
+from dotenv import load_dotenv
+
+from utils.storage import open_storage
+
+
+async def recommended_shard_count(token):
+    async with aiohttp.ClientSession() as session:
+        async with session.get("https://discord.com/api/v10/gateway/bot",
+                               headers={"Authorization": f"Bot {token}"}) as response:
+            response.raise_for_status()
+            return (await response.json())["shards"]
+
+
+def split_shards(shard_count, clusters):
+    # Contiguous ranges, with the remainder spread over the first clusters
+    per_cluster, remainder = divmod(shard_count, clusters)
+    ranges = []
+    start = 0
+    for cluster in range(clusters):
+        size = per_cluster + (cluster < remainder)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return [shard_ids for shard_ids in ranges if shard_ids]
+
+
+def run_cluster(cluster_id, shard_count, shard_ids):
+    # main reads its settings at import time, so the environment has to be set first
+    os.environ.update(SHARDED="1", SHARD_COUNT=str(shard_count), SHARD_IDS=",".join(map(str, shard_ids)),
+                      CLUSTER_ID=str(cluster_id))
+    import main
+    asyncio.run(main.main())
+
+
+def start_cluster(cluster_id, shard_count, shard_ids):
+    process = multiprocessing.Process(target=run_cluster, args=(cluster_id, shard_count, shard_ids),
+                                      name=f"cluster-{cluster_id}")
+    process.start()
+    print(f"Started cluster {cluster_id} (pid {process.pid}) with shards {shard_ids[0]}-{shard_ids[-1]}")
+    return process
+
+
+def stop_clusters(processes, timeout=30):
+    # Each step gives every cluster until the same deadline, so a slow one doesn't hold up checking the rest
+    for stop in (None, "terminate", "kill"):
+        if stop:
+            for process in processes:
+                if process.is_alive():
+                    print(f"{process.name} (pid {process.pid}) hasn't exited, sending {stop}")
+                    getattr(process, stop)()
+        deadline = time.monotonic() + timeout
+        for process in processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+
+
+def launch(shard_count, clusters, max_backoff=300):
+    clusters = split_shards(shard_count, clusters)
+    processes = {cluster_id: start_cluster(cluster_id, shard_count, shard_ids)
+                 for cluster_id, shard_ids in enumerate(clusters)}
+    restarts = {cluster_id: 0 for cluster_id in processes}
+    try:
+        while processes:
+            time.sleep(5)
+            for cluster_id, process in list(processes.items()):
+                if process.is_alive():
+                    continue
+                if process.exitcode == 0:
+                    print(f"Cluster {cluster_id} exited")
+                    del processes[cluster_id]
+                    continue
+                # Back off on repeated crashes so a bad deploy doesn't hammer the gateway with IDENTIFYs
+                backoff = min(2 ** restarts[cluster_id], max_backoff)
+                restarts[cluster_id] += 1
+                print(f"Cluster {cluster_id} crashed with exit code {process.exitcode}, restarting in {backoff}s")
+                time.sleep(backoff)
+                processes[cluster_id] = start_cluster(cluster_id, shard_count, clusters[cluster_id])
+    except KeyboardInterrupt:
+        # Ctrl+C reaches the clusters too, and they shut down on it by draining their pending writes. Only a
+        # cluster that hasn't exited by the deadline is terminated, and then killed
+        stop_clusters(list(processes.values()))
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Run Duckmin as several processes, each owning a range of shards")
+    parser.add_argument("--clusters", type=int, default=int(os.getenv("CLUSTERS", 1)))
+    parser.add_argument("--shards", type=int, default=int(os.getenv("SHARD_COUNT", 0)) or None,
+                        help="Total shard count (defaults to Discord's recommendation)")
+    args = parser.parse_args()
+
+    if os.getenv("STORAGE_BACKEND", "sqlite") != "sqlite":
+        parser.error("Cluster mode needs STORAGE_BACKEND=sqlite")
+    # Open the database once up front so the JSON migration runs here rather than racing in every cluster
+    open_storage("sqlite", os.getenv("DATABASE_FILE", "duckmin.db")).close()
+
+    shard_count = args.shards or asyncio.run(recommended_shard_count(os.getenv("DISCORD_BOT_TOKEN")))
+    launch(shard_count, args.clusters)
@@ -1,63 +1,228 @@
 import discord
 from discord.ext import commands
 import asyncio
-import logging
 from dotenv import load_dotenv
 import os
-import aiohttp
+import signal
+import sys
+import time
+import yarl
+from utils.storage import open_storage
+from utils.persistence import WriteBehind
+from utils.outbound import OutboundDispatcher
+from utils.command_sync import sync_command_tree
+from utils.cache_profile import cache_options, cache_report
+from utils.cluster import ChangeFeed
+from utils.logs import get_logger, interaction_logger, setup_logging
+from utils.interactions import InteractionTree
+from utils.metrics import LoopLagMonitor, MetricsServer, metrics, stats_gauges
+from utils.profiler import Profiler
 
 load_dotenv()
 token = os.getenv('DISCORD_BOT_TOKEN')
 tenor_api_key = os.getenv('TENOR_TOKEN')
+tenor_base_url = os.getenv('TENOR_BASE_URL', 'https://tenor.googleapis.com/v2')
+gif_cache_file = os.getenv('GIF_CACHE_FILE', 'gif_cache.json')
+storage_backend = os.getenv('STORAGE_BACKEND', 'sqlite')
+database_file = os.getenv('DATABASE_FILE', 'duckmin.db')
+reminder_hour = int(os.getenv('REMINDER_HOUR', 9))
+reminder_cooldown = int(os.getenv('REMINDER_COOLDOWN', 3600))
+appreciation_cache_mb = float(os.getenv('APPRECIATION_CACHE_MB', 64))
+sync_guild_id = os.getenv('SYNC_GUILD_ID')
+command_hash_file = os.getenv('COMMAND_HASH_FILE', 'command_hashes.json')
+force_sync = os.getenv('FORCE_SYNC') == '1' or '--force-sync' in sys.argv
+cache_profile = os.getenv('CACHE_PROFILE', 'lean')
+intents = os.getenv('INTENTS')
+member_cache = os.getenv('MEMBER_CACHE')
+max_messages = int(os.getenv('MAX_MESSAGES')) if os.getenv('MAX_MESSAGES') else None
+sharded = os.getenv('SHARDED') == '1'
+shard_count = int(os.getenv('SHARD_COUNT')) if os.getenv('SHARD_COUNT') else None
+shard_ids = [int(shard_id) for shard_id in os.getenv('SHARD_IDS').split(',')] if os.getenv('SHARD_IDS') else None
+cluster_id = int(os.getenv('CLUSTER_ID')) if os.getenv('CLUSTER_ID') else None
+# Each cluster process writes its own file, since rotation isn't safe across processes. An empty LOG_FILE, as in
+# .env.example, means the default too
+log_file = os.getenv('LOG_FILE') or ('duckmin.log' if cluster_id is None else f'duckmin.{cluster_id}.log')
+log_level = os.getenv('LOG_LEVEL', 'INFO')
+log_levels = os.getenv('LOG_LEVELS', 'discord=WARNING')
+log_max_bytes = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+log_backups = int(os.getenv('LOG_BACKUPS', 5))
+# The Prometheus endpoint is only served when a port is set
+metrics_host = os.getenv('METRICS_HOST', '127.0.0.1')
+metrics_port = int(os.getenv('METRICS_PORT')) if os.getenv('METRICS_PORT') else None
+# Overrides for pointing the bot somewhere other than Discord, e.g. tools/fake_discord.py for load tests
+discord_api_base = os.getenv('DISCORD_API_BASE')
+discord_gateway = os.getenv('DISCORD_GATEWAY')
+# Where /profile and SIGUSR1 write collapsed stacks, and how long a SIGUSR1 profile runs
+profile_dir = os.getenv('PROFILE_DIR', 'profiles')
+profile_seconds = float(os.getenv('PROFILE_SECONDS', 30))
+# Slash commands that haven't responded after this many seconds are deferred for them
+interaction_defer_after = float(os.getenv('INTERACTION_DEFER_AFTER', 2.0))
 
+BotBase = commands.AutoShardedBot if sharded else commands.Bot
 
-class Client(commands.Bot):
+
+class Client(BotBase):
     def __init__(self):
-        super().__init__(command_prefix="?", intents=discord.Intents().all())
+        if discord_api_base:
+            # Interaction responses and webhooks are built from the same Route, so this covers them too
+            discord.http.Route.BASE = discord_api_base
+        if discord_gateway:
+            discord.gateway.DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(discord_gateway)
+        options = cache_options(cache_profile, intents, member_cache, max_messages)
+        if sharded:
+            options.update(shard_count=shard_count, shard_ids=shard_ids)
+        super().__init__(command_prefix="?", tree_cls=InteractionTree, **options)
+        self.tree.defer_after = interaction_defer_after
+        self.time_created = time.perf_counter()
         self.coglist = ["cogs.commands", "cogs.appreciation", "cogs.random_gif", "cogs.task_reminder", "cogs.pikmin"]
-        self.logger = logging.getLogger("logger")
-        self.logger.addHandler(logging.FileHandler("logger.log"))
-        self.logger.setLevel(logging.DEBUG)
-        self.session = None
+        self.logger = get_logger("duckmin") if cluster_id is None else get_logger("duckmin", cluster_id=cluster_id)
         self.tenor_api_key = tenor_api_key
+        self.tenor_base_url = tenor_base_url
+        self.gif_cache_file = gif_cache_file
+        self.reminder_hour = reminder_hour
+        self.reminder_cooldown = reminder_cooldown
+        self.appreciation_cache_bytes = int(appreciation_cache_mb * 1024 * 1024)
+        self.cluster_id = cluster_id
+        # Only the primary process runs once-per-bot work (command sync, reminders) when running as a cluster
+        self.is_primary = cluster_id in (None, 0)
+        self.storage = open_storage(storage_backend, database_file, origin=cluster_id)
+        self.persistence = WriteBehind(self.storage)
+        self.outbound = OutboundDispatcher()
+        self.change_feed = ChangeFeed(self) if cluster_id is not None else None
+        self.handoff = {}
+        self.loop_lag = LoopLagMonitor()
+        self.profiler = Profiler(profile_dir)
+        self.profile_task = None
+        self.shutdown_task = None
+        self.metrics_server = MetricsServer(metrics_host, metrics_port) if metrics_port else None
+        metrics.add_collector(self.collect_stats)
 
     async def on_ready(self):
-        try:
-            print(f"Successfully logged in as {self.user}!")
-            synced = await self.tree.sync()
-            print(f"Synced {len(synced)} commands!")
-            syn = await self.tree.sync(guild=discord.Object(id="ID Here"))
-            print(f'Synced {len(syn)} in {syn[0].guild.name}' if syn else 'No commands were synced')
-        except Exception as err:
-            self.logger.error(err)
+        self.logger.info("Successfully logged in as %s! (ready after %.2fs)", self.user,
+                         time.perf_counter() - self.time_created)
+        counts, approx_bytes = cache_report(self)
+        self.logger.info("Cache (%s profile): %s, ~%.1f MiB", cache_profile,
+                         ", ".join(f"{count} {name}" for name, count in counts.items()), approx_bytes / 1024 / 1024,
+                         extra={"cache": counts})
         await self.change_presence(activity=discord.Activity(type=discord.ActivityType.listening, name="to help"))
 
     async def setup_hook(self):
-        self.session = aiohttp.ClientSession()
         for ext in self.coglist:
             await self.load_extension(ext)
-        await self.tree.sync()
+        self.logger.info("Loaded %d extensions in %.2fs", len(self.coglist), time.perf_counter() - self.time_created)
+        self.tree.error(self.on_app_command_error)
+        if self.change_feed:
+            self.change_feed.start()
+        self.loop_lag.start()
+        if hasattr(signal, "SIGUSR1"):
+            # `kill -USR1 <pid>` profiles a running bot without going through Discord
+            self.loop.add_signal_handler(signal.SIGUSR1, self.profile_on_signal)
+            # docker stop, systemd and Ctrl+C shut down through close(), so queued writes are drained first
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                self.loop.add_signal_handler(signum, self.close_on_signal, signum)
+        if self.metrics_server:
+            await self.metrics_server.start()
+        if self.is_primary:
+            await self.sync_commands(force=force_sync)
+
+    async def sync_commands(self, force=False):
+        try:
+            await sync_command_tree(self.tree, command_hash_file, force=force)
+            if sync_guild_id:
+                await sync_command_tree(self.tree, command_hash_file, guild=discord.Object(id=int(sync_guild_id)),
+                                        force=force)
+        except Exception:
+            self.logger.exception("Error syncing commands")
+
+    async def reload_cog(self, extension):
+        # Cogs with export_state hand their in-memory state to the instances the reloaded module creates. A cog only
+        # takes its state once it has loaded, so if the new module fails the restored old one picks it up instead
+        started = time.perf_counter()
+        for cog in list(self.cogs.values()):
+            if cog.__module__ == extension and hasattr(cog, "export_state"):
+                self.handoff[cog.qualified_name] = cog.export_state()
+        try:
+            await self.reload_extension(extension)
+        finally:
+            self.handoff.clear()
+        # Only reaches Discord if the reloaded commands' schema changed
+        if self.is_primary:
+            await self.sync_commands()
+        elapsed = time.perf_counter() - started
+        self.logger.info("Reloaded %s in %.3fs", extension, elapsed)
+        return elapsed
+
+    def close_on_signal(self, signum):
+        self.logger.info("Received %s, shutting down", signal.Signals(signum).name)
+        self.start_shutdown()
+
+    def profile_on_signal(self):
+        if self.profiler.active:
+            self.logger.info("Ignoring SIGUSR1, a profile is already running")
+            return
+        self.logger.info("Profiling the event loop for %.0fs (SIGUSR1)", profile_seconds)
+        self.profile_task = asyncio.create_task(self.profiler.profile(profile_seconds))
+
+    async def _run_event(self, coro, event_name, *args, **kwargs):
+        # Every event handler, cog listeners included, runs through here
+        with metrics.timer("event_handler_seconds", event=event_name):
+            if self.profiler.active:
+                with self.profiler.listener(coro):
+                    await super()._run_event(coro, event_name, *args, **kwargs)
+            else:
+                await super()._run_event(coro, event_name, *args, **kwargs)
+
+    def collect_stats(self):
+        yield from stats_gauges("persistence", self.persistence.stats())
+        yield from stats_gauges("outbound", self.outbound.stats())
+        for name, cog in self.cogs.items():
+            yield from stats_gauges("cog", getattr(cog, "stats", {}), cog=name)
+        yield "guilds", {}, len(self.guilds)
+
+    async def on_app_command_completion(self, interaction, command):
+        interaction_logger(self.logger, interaction).debug("Command completed")
+
+    async def on_app_command_error(self, interaction, error):
+        if isinstance(error, discord.app_commands.CheckFailure):
+            interaction_logger(self.logger, interaction).info("Command check failed: %s", error)
+            return
+        interaction_logger(self.logger, interaction).error("Unhandled error in command", exc_info=error)
+
+    def start_shutdown(self):
+        if self.shutdown_task is None:
+            self.shutdown_task = asyncio.create_task(self.shutdown())
+        return self.shutdown_task
 
     async def close(self):
+        # Every caller waits on the same shutdown, which a cancelled caller doesn't interrupt
+        await asyncio.shield(self.start_shutdown())
+
+    async def shutdown(self):
         await super().close()
-        if self.session:
-            await self.session.close()
+        if self.change_feed:
+            self.change_feed.stop()
+        self.loop_lag.stop()
+        if self.metrics_server:
+            await self.metrics_server.close()
+        await self.outbound.close()
+        await self.persistence.drain()
+        self.storage.close()
 
 
+log_listener = setup_logging(log_file, log_level, log_levels, log_max_bytes, log_backups)
 client = Client()
 
-logging.basicConfig(filename="log.txt", level=logging.INFO)
-
 
 async def main():
     async with client:
         try:
             await client.start(token)
-        except Exception as err:
-            client.logger.error(err)
+        except Exception:
+            client.logger.exception("Error running client")
         finally:
-            if not client.is_closed():
-                await client.close()
+            # Also waits for a shutdown a signal started to finish draining
+            await client.close()
+            log_listener.stop()
 
 
 if __name__ == "__main__":
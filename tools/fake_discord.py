@@ -0,0 +1,621 @@
+import argparse
+import asyncio
+import datetime
+import hashlib
+import json
+import random
+import string
+import time
+import zlib
+
+from aiohttp import WSMsgType, web
+
+API = "/api/v10"
+DISCORD_EPOCH = 1420070400000
+HEARTBEAT_INTERVAL = 41250
+# Discord drops interactions that aren't acknowledged within 3 seconds
+INTERACTION_DEADLINE = 3.0
+GLOBAL_LIMIT = 50
+# (requests, per seconds) for the routes the bot uses most; everything else gets DEFAULT_LIMIT
+ROUTE_LIMITS = {
+    "POST /channels/:id/messages": (5, 5.0),
+    "PATCH /channels/:id/messages/:id": (5, 5.0),
+    "POST /users/@me/channels": (10, 10.0),
+    "POST /webhooks/:id/:token": (5, 2.0),
+    "PATCH /webhooks/:id/:token/messages/@original": (5, 2.0),
+}
+DEFAULT_LIMIT = (50, 1.0)
+# Interaction responses and followups don't count towards the global limit
+GLOBAL_EXEMPT = ("/interactions/", "/webhooks/")
+MAJOR_PARAMETERS = ("channels", "guilds", "webhooks", "interactions")
+# (command, weight, options); options are (name, type, value factory)
+COMMAND_MIX = (
+    ("show_appreciations", 4, ()),
+    ("view_tasks", 4, ()),
+    ("add_task", 2, (("task", 3, lambda: f"Task {random.randrange(1000)}"),
+                     ("due_date", 3, lambda: f"{random.randint(1, 12):02}-{random.randint(1, 28):02}"))),
+    ("appreciate", 1, ()),
+    ("status", 1, ()),
+    ("coloured_name", 1, (("name", 3, lambda: "Olimar"), ("color", 3, lambda: random.choice(("red", "#00ff00"))))),
+    ("randomgif", 1, (("choice", 3, lambda: random.choice(("splatoon", "pikmin"))),)),
+)
+# (weight, label, custom_id factory taking guild and user ids and today's date)
+CLICK_MIX = (
+    (3, "Next", lambda guild_id, user_id, day: f"appreciation:next:{guild_id}:{day}:5:2:0:{random.randrange(5)}"),
+    (1, "Save", lambda guild_id, user_id, day: f"appreciation:save:{guild_id}:{day}:u{user_id}"),
+    (2, "Ignore for 1 hour", lambda guild_id, user_id, day: f"reminder:ignore_hour:{user_id}:t{random.randint(1, 9)}"),
+    (2, "Ignore for today", lambda guild_id, user_id, day: f"reminder:ignore_day:{user_id}:t{random.randint(1, 9)}"),
+    (1, "Mark as done", lambda guild_id, user_id, day: f"reminder:done:{user_id}:t{random.randint(1, 9)}"),
+)
+CLICKABLE_PREFIXES = ("appreciation:", "reminder:", "tasks:", "saved:")
+
+
+def snowflake(at=None):
+    milliseconds = int((at if at is not None else time.time()) * 1000) - DISCORD_EPOCH
+    return str((milliseconds << 22) | random.getrandbits(22))
+
+
+def timestamp():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+def percentile(samples, q):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def json_response(data, status=200, headers=None):
+    # discord.py only parses bodies whose content type is exactly application/json, without a charset
+    return web.Response(body=json.dumps(data).encode(), status=status,
+                        headers={**(headers or {}), "Content-Type": "application/json"})
+
+
+def parse_route(method, path):
+    # "POST /channels/:id/messages" for stats and limits, plus the major parameter Discord buckets by
+    parts = path.split("/")
+    template = []
+    major = ""
+    for i, part in enumerate(parts):
+        if part.isdigit():
+            template.append(":id")
+            if not major and parts[i - 1] in MAJOR_PARAMETERS:
+                major = part
+        elif i >= 2 and parts[i - 2] in ("webhooks", "interactions") and parts[i - 1].isdigit():
+            template.append(":token")
+            if parts[i - 2] == "webhooks":
+                major += f":{part}"
+        else:
+            template.append(part)
+    return f"{method} {'/'.join(template)}", major
+
+
+class Bucket:
+    __slots__ = ("limit", "per", "remaining", "reset_at")
+
+    def __init__(self, limit, per):
+        self.limit = limit
+        self.per = per
+        self.remaining = limit
+        self.reset_at = 0.0
+
+    def hit(self, now):
+        if now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = now + self.per
+        if not self.remaining:
+            return False
+        self.remaining -= 1
+        return True
+
+    def headers(self, now, bucket_hash):
+        reset_after = max(0.0, self.reset_at - now)
+        return {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": f"{time.time() + reset_after:.3f}",
+            "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+            "X-RateLimit-Bucket": bucket_hash,
+        }
+
+
+class Step:
+    # Everything measured while one message rate was being replayed
+    def __init__(self, message_rate):
+        self.message_rate = message_rate
+        self.started = time.perf_counter()
+        self.ended = None
+        self.events = {"MESSAGE_CREATE": 0, "INTERACTION_CREATE": 0}
+        self.acks = {}
+        self.ack_types = {}
+        self.expired = {}
+        self.rest = {}
+        self.rate_limited = {"route": 0, "global": 0}
+
+    def report(self):
+        elapsed = (self.ended or time.perf_counter()) - self.started
+        all_acks = [sample for samples in self.acks.values() for sample in samples]
+        return {
+            "message_rate": self.message_rate,
+            "seconds": round(elapsed, 2),
+            "events": self.events,
+            "ack_ms": {"count": len(all_acks), "p50": round(percentile(all_acks, 0.5) * 1000, 1),
+                       "p99": round(percentile(all_acks, 0.99) * 1000, 1),
+                       "max": round(max(all_acks, default=0.0) * 1000, 1)},
+            "ack_ms_by_name": {name: {"count": len(samples), "p50": round(percentile(samples, 0.5) * 1000, 1),
+                                      "p99": round(percentile(samples, 0.99) * 1000, 1)}
+                               for name, samples in sorted(self.acks.items())},
+            "ack_types": self.ack_types,
+            "expired": self.expired,
+            "rest_calls": sum(self.rest.values()),
+            "rest_per_second": round(sum(self.rest.values()) / elapsed, 1) if elapsed else 0.0,
+            "rest_by_route": dict(sorted(self.rest.items(), key=lambda item: -item[1])),
+            "rate_limited": self.rate_limited,
+        }
+
+
+class GatewaySession:
+    def __init__(self, server, ws, compress):
+        self.server = server
+        self.ws = ws
+        self.sequence = 0
+        self.shard = (0, 1)
+        self.session_id = "".join(random.choices(string.ascii_lowercase + string.digits, k=32))
+        self.identified_at = None
+        self.compress = self.compressor(compress)
+
+    @staticmethod
+    def compressor(kind):
+        if kind == "zlib-stream":
+            context = zlib.compressobj()
+            return lambda data: context.compress(data) + context.flush(zlib.Z_SYNC_FLUSH)
+        if kind == "zstd-stream":
+            # Only requested by discord.py when zstandard is installed, so it's importable here too
+            import zstandard
+            context = zstandard.ZstdCompressor().compressobj()
+            return lambda data: context.compress(data) + context.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return None
+
+    async def send(self, payload):
+        data = json.dumps(payload, separators=(",", ":"))
+        if self.compress:
+            await self.ws.send_bytes(self.compress(data.encode()))
+        else:
+            await self.ws.send_str(data)
+
+    async def dispatch(self, event, data):
+        self.sequence += 1
+        await self.send({"op": 0, "t": event, "s": self.sequence, "d": data})
+
+    async def run(self):
+        await self.send({"op": 10, "d": {"heartbeat_interval": HEARTBEAT_INTERVAL}})
+        async for message in self.ws:
+            if message.type is not WSMsgType.TEXT:
+                continue
+            payload = json.loads(message.data)
+            op = payload["op"]
+            if op == 1:
+                await self.send({"op": 11})
+            elif op == 2:
+                await self.identify(payload["d"])
+            elif op == 6:
+                await self.resume(payload["d"])
+            elif op == 3 and self.identified_at is not None:
+                # discord.py sets the presence from on_ready, so the first update marks the shard as ready
+                self.server.ready_seconds[self.shard[0]] = time.perf_counter() - self.identified_at
+                self.identified_at = None
+        if self.server.sessions.get(self.shard[0]) is self:
+            del self.server.sessions[self.shard[0]]
+
+    async def resume(self, data):
+        shard = self.server.resumable.get(data["session_id"])
+        if shard is None:
+            # Invalid session, not resumable: the client identifies again
+            await self.send({"op": 9, "d": False})
+            return
+        self.shard, self.session_id, self.sequence = shard, data["session_id"], data["seq"]
+        self.server.sessions[shard[0]] = self
+        await self.dispatch("RESUMED", {})
+
+    async def identify(self, data):
+        self.shard = tuple(data.get("shard") or (0, 1))
+        # An unsharded bot identifies without a shard, and gets every guild whatever --shards says
+        self.server.shard_count = self.shard[1]
+        self.identified_at = time.perf_counter()
+        guilds = [guild for guild in self.server.guilds if self.server.shard_for(guild) == self.shard[0]]
+        await self.dispatch("READY", {
+            "v": 10,
+            "user": self.server.bot_user,
+            "guilds": [{"id": guild, "unavailable": True} for guild in guilds],
+            "session_id": self.session_id,
+            "resume_gateway_url": self.server.gateway_url,
+            "shard": list(self.shard),
+            "application": {"id": self.server.application_id, "flags": 0},
+            "private_channels": [],
+        })
+        for guild in guilds:
+            await self.dispatch("GUILD_CREATE", self.server.guild_payload(guild))
+        self.server.sessions[self.shard[0]] = self
+        self.server.resumable[self.session_id] = self.shard
+
+
+class FakeDiscord:
+    # A stand-in for Discord's gateway and REST API: replays generated or recorded traffic at the bot and
+    # measures how quickly it acknowledges interactions and how many REST calls it makes doing so
+    def __init__(self, guilds=100, users=1000, shards=1, host="127.0.0.1", port=8090):
+        self.host = host
+        self.port = port
+        self.shard_count = shards
+        self.guilds = [snowflake() for _ in range(guilds)]
+        self.channels = {guild: snowflake() for guild in self.guilds}
+        self.users = [self.user_payload(snowflake(), f"user{i}") for i in range(users)]
+        self.application_id = snowflake()
+        self.bot_user = self.user_payload(self.application_id, "Duckmin", bot=True)
+        self.owner = self.user_payload(snowflake(), "owner")
+        self.sessions = {}
+        self.resumable = {}
+        self.ready_seconds = {}
+        self.buckets = {}
+        self.global_bucket = Bucket(GLOBAL_LIMIT, 1.0)
+        self.pending = {}
+        self.expired_ids = set()
+        self.clickable = []
+        self.step = Step(0)
+        self.record_file = None
+        self.record_started = None
+
+    @property
+    def gateway_url(self):
+        return f"ws://{self.host}:{self.port}/gateway"
+
+    def shard_for(self, guild_id):
+        return (int(guild_id) >> 22) % self.shard_count
+
+    @staticmethod
+    def user_payload(user_id, name, bot=False):
+        return {"id": user_id, "username": name, "global_name": None, "discriminator": "0", "avatar": None,
+                "bot": bot, "public_flags": 0}
+
+    def guild_payload(self, guild_id):
+        channel = {"id": self.channels[guild_id], "type": 0, "guild_id": guild_id, "name": "general",
+                   "position": 0, "permission_overwrites": [], "nsfw": False, "parent_id": None}
+        return {"id": guild_id, "name": f"Guild {guild_id[-4:]}", "icon": None, "owner_id": self.owner["id"],
+                "roles": [{"id": guild_id, "name": "@everyone", "permissions": "2248473465835073", "position": 0,
+                           "color": 0, "hoist": False, "managed": False, "mentionable": False}],
+                "emojis": [], "stickers": [], "features": [], "member_count": len(self.users), "members": [],
+                "channels": [channel], "threads": [], "presences": [], "voice_states": [], "large": True,
+                "unavailable": False, "premium_tier": 0, "preferred_locale": "en-US", "afk_channel_id": None,
+                "system_channel_id": None, "verification_level": 0, "default_message_notifications": 0,
+                "explicit_content_filter": 0, "mfa_level": 0, "nsfw_level": 0, "joined_at": timestamp()}
+
+    def message_payload(self, channel_id, author, guild_id=None, content="", embeds=(), components=(), flags=0):
+        payload = {"id": snowflake(), "type": 0, "channel_id": channel_id, "author": author, "content": content,
+                   "timestamp": timestamp(), "edited_timestamp": None, "tts": False, "mention_everyone": False,
+                   "mentions": [], "mention_roles": [], "attachments": [], "embeds": list(embeds),
+                   "components": list(components), "pinned": False, "flags": flags}
+        if guild_id:
+            payload["guild_id"] = guild_id
+        return payload
+
+    def member_payload(self, user):
+        return {"user": user, "roles": [], "joined_at": timestamp(), "deaf": False, "mute": False, "flags": 0,
+                "permissions": "2248473465835073"}
+
+    # Generated traffic
+
+    def message_create(self):
+        guild = random.choice(self.guilds)
+        user = random.choice(self.users)
+        content = " ".join(random.choices(("duck", "pikmin", "task", "today", "hello", "ian"), k=6))
+        payload = self.message_payload(self.channels[guild], user, guild, content)
+        payload["member"] = {key: value for key, value in self.member_payload(user).items() if key != "user"}
+        return payload
+
+    def interaction_payload(self, interaction_type, guild, user, data, message=None):
+        payload = {"id": snowflake(), "application_id": self.application_id, "type": interaction_type,
+                   "data": data, "guild_id": guild, "channel_id": self.channels[guild],
+                   "channel": {"id": self.channels[guild], "type": 0, "guild_id": guild, "name": "general"},
+                   "member": self.member_payload(user), "token": "".join(random.choices(string.ascii_letters, k=64)),
+                   "version": 1, "app_permissions": "2248473465835073", "locale": "en-US", "guild_locale": "en-US",
+                   "attachment_size_limit": 10 * 1024 * 1024,
+                   "entitlements": [], "authorizing_integration_owners": {"0": guild}, "context": 0}
+        if message is not None:
+            payload["message"] = message
+        return payload
+
+    def command_interaction(self):
+        name, _, options = random.choices(COMMAND_MIX, weights=[weight for _, weight, _ in COMMAND_MIX])[0]
+        data = {"id": snowflake(), "name": name, "type": 1,
+                "options": [{"name": option, "type": kind, "value": value()} for option, kind, value in options]}
+        return self.interaction_payload(2, random.choice(self.guilds), random.choice(self.users), data)
+
+    def click_interaction(self):
+        # Prefers buttons the bot actually sent, falling back to ones built from the cogs' custom_id formats
+        if self.clickable and random.random() < 0.5:
+            guild, message, custom_id = random.choice(self.clickable)
+            user = random.choice(self.users)
+        else:
+            guild, user = random.choice(self.guilds), random.choice(self.users)
+            _, label, factory = random.choices(CLICK_MIX, weights=[weight for weight, _, _ in CLICK_MIX])[0]
+            custom_id = factory(guild, user["id"], datetime.date.today().isoformat())
+            component = {"type": 1, "components": [{"type": 2, "style": 2, "label": label, "custom_id": custom_id}]}
+            message = self.message_payload(self.channels[guild], self.bot_user, guild, components=[component])
+        data = {"custom_id": custom_id, "component_type": 2}
+        return self.interaction_payload(3, guild, user, data, message)
+
+    def remember_clickable(self, guild, message):
+        for row in message.get("components") or ():
+            for component in row.get("components", ()):
+                if component.get("custom_id", "").startswith(CLICKABLE_PREFIXES):
+                    self.clickable.append((guild, message, component["custom_id"]))
+        del self.clickable[:-1000]
+
+    async def send_event(self, event, data):
+        guild = data.get("guild_id")
+        session = self.sessions.get(self.shard_for(guild) if guild else 0)
+        if session is None:
+            return
+        if event == "INTERACTION_CREATE":
+            data["id"] = snowflake()
+            name = data["data"].get("name") or data["data"]["custom_id"].split(":")[0]
+            self.pending[data["id"]] = (time.perf_counter(), name, guild)
+        if self.record_file:
+            self.record_file.write(json.dumps({"at": time.perf_counter() - self.record_started, "t": event,
+                                               "d": data}) + "\n")
+        self.step.events[event] = self.step.events.get(event, 0) + 1
+        await session.dispatch(event, data)
+
+    async def pace(self, rate, make_event):
+        # Sends whatever is due every tick, so high rates don't need a sleep per event
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        sent = 0
+        while True:
+            due = int((loop.time() - started) * rate)
+            for _ in range(due - sent):
+                await self.send_event(*make_event())
+            sent = due
+            await asyncio.sleep(0.01)
+
+    def adopt(self, events):
+        # Replayed events refer to the recording's guilds and channels, so those are what the bot gets sent
+        self.channels = {event["d"]["guild_id"]: event["d"]["channel_id"] for event in events
+                         if event["d"].get("guild_id")}
+        self.guilds = list(self.channels)
+
+    async def replay(self, events):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for event in events:
+            delay = event["at"] - (loop.time() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self.send_event(event["t"], event["d"])
+
+    def expire_pending(self):
+        now = time.perf_counter()
+        for interaction_id, (dispatched, name, _) in list(self.pending.items()):
+            if now - dispatched > INTERACTION_DEADLINE:
+                del self.pending[interaction_id]
+                self.expired_ids.add(interaction_id)
+                self.step.expired[name] = self.step.expired.get(name, 0) + 1
+
+    def is_expired(self, interaction_id):
+        # Like Discord, a callback after the deadline is rejected as an unknown interaction
+        pending = self.pending.get(interaction_id)
+        if pending is not None and time.perf_counter() - pending[0] > INTERACTION_DEADLINE:
+            self.expire_pending()
+        return interaction_id in self.expired_ids
+
+    # REST
+
+    def app(self):
+        app = web.Application(client_max_size=32 * 1024 * 1024)
+        app.router.add_get("/gateway", self.gateway)
+        app.router.add_route("*", API + "/{path:.*}", self.rest)
+        return app
+
+    async def gateway(self, request):
+        ws = web.WebSocketResponse(max_msg_size=0)
+        await ws.prepare(request)
+        await GatewaySession(self, ws, request.query.get("compress")).run()
+        return ws
+
+    async def rest(self, request):
+        route, major = parse_route(request.method, request.path[len(API):])
+        self.step.rest[route] = self.step.rest.get(route, 0) + 1
+        now = time.monotonic()
+
+        if not request.path.startswith(GLOBAL_EXEMPT, len(API)) and not self.global_bucket.hit(now):
+            self.step.rate_limited["global"] += 1
+            return self.rate_limited(self.global_bucket.reset_at - now, "global")
+        bucket_hash = hashlib.md5(route.encode()).hexdigest()[:16]
+        bucket = self.buckets.get((route, major))
+        if bucket is None:
+            bucket = self.buckets[(route, major)] = Bucket(*ROUTE_LIMITS.get(route, DEFAULT_LIMIT))
+        if not bucket.hit(now):
+            self.step.rate_limited["route"] += 1
+            return self.rate_limited(bucket.reset_at - now, "user", bucket.headers(now, bucket_hash))
+
+        body = await request.json() if request.can_read_body and request.content_type == "application/json" else {}
+        headers = bucket.headers(now, bucket_hash)
+        if route == "POST /interactions/:id/:token/callback" and self.is_expired(request.path[len(API):].split("/")[2]):
+            return json_response({"message": "Unknown interaction", "code": 10062}, status=404, headers=headers)
+        result = self.respond(route, request, body)
+        if result is None:
+            return web.Response(status=204, headers=headers)
+        return json_response(result, headers=headers)
+
+    @staticmethod
+    def rate_limited(retry_after, scope, headers=None):
+        headers = dict(headers or {}, **{"X-RateLimit-Scope": scope, "Retry-After": str(int(retry_after) + 1),
+                                         "Via": "1.1 google"})
+        if scope == "global":
+            headers["X-RateLimit-Global"] = "true"
+        return json_response({"message": "You are being rate limited.", "retry_after": round(retry_after, 3),
+                              "global": scope == "global"}, status=429, headers=headers)
+
+    def respond(self, route, request, body):
+        parts = request.path[len(API):].split("/")
+        if route == "GET /users/@me":
+            return self.bot_user
+        if route == "GET /oauth2/applications/@me":
+            return {"id": self.application_id, "name": "Duckmin", "description": "", "icon": None,
+                    "bot_public": False, "bot_require_code_grant": False, "owner": self.owner, "verify_key": "0",
+                    "flags": 0, "rpc_origins": []}
+        if route in ("GET /gateway/bot", "GET /gateway"):
+            return {"url": self.gateway_url, "shards": self.shard_count,
+                    "session_start_limit": {"total": 1000, "remaining": 1000, "reset_after": 0,
+                                            "max_concurrency": 1}}
+        if route.startswith("PUT /applications/"):
+            return [{**command, "id": snowflake(), "application_id": self.application_id, "version": snowflake(),
+                     "type": command.get("type", 1)} for command in body]
+        if route.startswith("GET /applications/"):
+            return []
+        if route == "POST /interactions/:id/:token/callback":
+            return self.acknowledge(parts[2], body)
+        if route == "POST /users/@me/channels":
+            user = next((user for user in self.users if user["id"] == body.get("recipient_id")), self.owner)
+            return {"id": snowflake(), "type": 1, "recipients": [user], "last_message_id": None}
+        if route == "GET /users/:id":
+            return next((user for user in self.users if user["id"] == parts[2]),
+                        self.user_payload(parts[2], "someone"))
+        if request.method in ("POST", "PATCH", "GET") and ("messages" in parts or route.startswith("POST /webhooks")):
+            channel_id = parts[2] if parts[1] == "channels" else snowflake()
+            return self.message_payload(channel_id, self.bot_user, content=body.get("content") or "",
+                                        embeds=body.get("embeds") or (), components=body.get("components") or ())
+        if request.method == "DELETE":
+            return None
+        return {}
+
+    def acknowledge(self, interaction_id, body):
+        pending = self.pending.pop(interaction_id, None)
+        response_type = body.get("type")
+        self.step.ack_types[str(response_type)] = self.step.ack_types.get(str(response_type), 0) + 1
+        guild = None
+        if pending is not None:
+            dispatched, name, guild = pending
+            self.step.acks.setdefault(name, []).append(time.perf_counter() - dispatched)
+
+        data = body.get("data") or {}
+        result = {"interaction": {"id": interaction_id, "type": 2, "response_message_loading": response_type == 5,
+                                  "response_message_ephemeral": bool(data.get("flags", 0) & 64)}}
+        if response_type in (4, 7):
+            message = self.message_payload(snowflake(), self.bot_user, guild, data.get("content") or "",
+                                           data.get("embeds") or (), data.get("components") or (),
+                                           data.get("flags", 0))
+            if guild:
+                self.remember_clickable(guild, message)
+            result["interaction"]["response_message_id"] = message["id"]
+            result["resource"] = {"type": response_type, "message": message}
+        elif response_type is not None:
+            result["resource"] = {"type": response_type}
+        return result
+
+    # Running
+
+    async def start(self):
+        runner = web.AppRunner(self.app(), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, self.host, self.port).start()
+        return runner
+
+    async def wait_for_shards(self, warmup):
+        while len(self.sessions) < self.shard_count or len(self.ready_seconds) < self.shard_count:
+            await asyncio.sleep(0.1)
+        await asyncio.sleep(warmup)
+
+    async def run_step(self, message_rate, command_rate, click_rate, seconds):
+        self.step = Step(message_rate)
+        senders = [asyncio.create_task(self.pace(rate, make_event)) for rate, make_event in (
+            (message_rate, lambda: ("MESSAGE_CREATE", self.message_create())),
+            (command_rate, lambda: ("INTERACTION_CREATE", self.command_interaction())),
+            (click_rate, lambda: ("INTERACTION_CREATE", self.click_interaction())),
+        ) if rate > 0]
+        try:
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                await asyncio.sleep(0.25)
+                self.expire_pending()
+        finally:
+            for sender in senders:
+                sender.cancel()
+        # Give the last interactions their full deadline before counting them as expired
+        await asyncio.sleep(INTERACTION_DEADLINE)
+        self.expire_pending()
+        self.step.ended = time.perf_counter()
+        return self.step.report()
+
+
+def print_step(report):
+    acks = report["ack_ms"]
+    rate = "replay" if report["message_rate"] is None else f"{report['message_rate']:g} msg/s"
+    print(f"{rate:>12}  {report['events']['MESSAGE_CREATE']:>7} messages  "
+          f"{report['events']['INTERACTION_CREATE']:>6} interactions  ack p50 {acks['p50']}ms p99 {acks['p99']}ms "
+          f"max {acks['max']}ms  expired {sum(report['expired'].values())}  REST {report['rest_calls']} "
+          f"({report['rest_per_second']}/s)  429s {report['rate_limited']}")
+    for route, count in list(report["rest_by_route"].items())[:5]:
+        print(f"{'':>10}{count:>7}  {route}")
+
+
+async def main(args):
+    server = FakeDiscord(args.guilds, args.users, args.shards, args.host, args.port)
+    if args.replay:
+        with open(args.replay, "r") as f:
+            events = [json.loads(line) for line in f if line.strip()]
+        server.adopt(events)
+    runner = await server.start()
+    print(f"Waiting for the bot: DISCORD_API_BASE=http://{args.host}:{args.port}{API} "
+          f"DISCORD_GATEWAY={server.gateway_url}")
+    await server.wait_for_shards(args.warmup)
+    print(f"{len(server.guilds)} guilds on {args.shards} shard(s) ready in "
+          f"{max(server.ready_seconds.values()):.2f}s (identify to first presence update)")
+
+    reports = []
+    try:
+        if args.replay:
+            server.step = Step(None)
+            await server.replay(events)
+            await asyncio.sleep(INTERACTION_DEADLINE)
+            server.expire_pending()
+            server.step.ended = time.perf_counter()
+            reports.append(server.step.report())
+            print_step(reports[-1])
+        else:
+            if args.record:
+                server.record_file = open(args.record, "w")
+                server.record_started = time.perf_counter()
+            for message_rate in args.message_rates:
+                reports.append(await server.run_step(message_rate, args.command_rate, args.click_rate,
+                                                     args.step_seconds))
+                print_step(reports[-1])
+    finally:
+        if server.record_file:
+            server.record_file.close()
+        await runner.cleanup()
+
+    if args.report:
+        with open(args.report, "a") as f:
+            f.write(json.dumps({"guilds": len(server.guilds), "users": args.users, "shards": args.shards,
+                                "ready_seconds": server.ready_seconds, "steps": reports}) + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a fake Discord gateway and REST API and load-test the bot "
+                                                 "connected to it")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--guilds", type=int, default=100)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--shards", type=int, default=1, help="Shard count handed out by /gateway/bot")
+    parser.add_argument("--message-rates", type=lambda value: [float(rate) for rate in value.split(",")],
+                        default=[10.0, 100.0, 1000.0], help="Comma separated messages per second, one step each")
+    parser.add_argument("--command-rate", type=float, default=5.0, help="Slash commands per second")
+    parser.add_argument("--click-rate", type=float, default=5.0, help="Button clicks per second")
+    parser.add_argument("--step-seconds", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=5.0, help="Seconds to wait after the bot is ready")
+    parser.add_argument("--record", help="Write the generated traffic to this JSON-lines file")
+    parser.add_argument("--replay", help="Replay a file written by --record instead of generating traffic")
+    parser.add_argument("--report", help="Append the results to this JSON-lines file")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,51 @@
+import argparse
+import asyncio
+import random
+
+from aiohttp import web
+
+
+class TenorStub:
+    def __init__(self, latency=0.0, error_rate=0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = {"search": 0, "search_suggestions": 0}
+
+    async def delay(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if random.random() < self.error_rate:
+            raise web.HTTPServiceUnavailable()
+
+    async def search(self, request):
+        self.requests["search"] += 1
+        await self.delay()
+        term = request.query.get("q", "")
+        limit = int(request.query.get("limit", 20))
+        pos = int(request.query.get("pos", 0))
+        results = [
+            {"id": f"{term}-{i}", "media_formats": {"gif": {"url": f"https://media.example/{term}/{i}.gif"}}}
+            for i in range(pos, pos + limit)
+        ]
+        return web.json_response({"results": results, "next": str(pos + limit)})
+
+    async def search_suggestions(self, request):
+        self.requests["search_suggestions"] += 1
+        await self.delay()
+        term = request.query.get("q", "")
+        return web.json_response({"results": [f"{term} {suffix}" for suffix in ("funny", "cute", "dance")]})
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/v2/search", self.search)
+        app.router.add_get("/v2/search_suggestions", self.search_suggestions)
+        return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a fake Tenor API for local runs of the GIF cog")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 503")
+    args = parser.parse_args()
+    web.run_app(TenorStub(args.latency, args.error_rate).app(), port=args.port)
@@ -0,0 +1,58 @@
+import discord
+
+# The cogs only need guild messages (task reminders, status panel cleanup), DMs and interactions
+PROFILES = {
+    "lean": {"intents": "guilds,guild_messages,dm_messages", "member_cache": "none", "max_messages": 0},
+    "full": {"intents": "all", "member_cache": "from_intents", "max_messages": 1000},
+}
+
+# Rough resident size of each cached object, used for the startup report
+APPROX_BYTES = {"guilds": 4096, "channels": 512, "members": 768, "users": 512, "messages": 2048}
+
+
+def build_intents(names):
+    if names == "all":
+        return discord.Intents.all()
+    intents = discord.Intents.none()
+    for name in filter(None, (name.strip() for name in names.split(","))):
+        if name not in discord.Intents.VALID_FLAGS:
+            raise ValueError(f"Unknown intent: {name}")
+        setattr(intents, name, True)
+    return intents
+
+
+def build_member_cache_flags(name, intents):
+    if name == "from_intents":
+        return discord.MemberCacheFlags.from_intents(intents)
+    if name == "none":
+        return discord.MemberCacheFlags.none()
+    flags = discord.MemberCacheFlags.none()
+    for flag in filter(None, (flag.strip() for flag in name.split(","))):
+        setattr(flags, flag, True)
+    return flags
+
+
+def cache_options(profile="lean", intents=None, member_cache=None, max_messages=None):
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown cache profile: {profile}")
+    settings = PROFILES[profile]
+    built_intents = build_intents(intents or settings["intents"])
+    max_messages = settings["max_messages"] if max_messages is None else max_messages
+    return {
+        "intents": built_intents,
+        "member_cache_flags": build_member_cache_flags(member_cache or settings["member_cache"], built_intents),
+        "max_messages": max_messages or None,
+        "chunk_guilds_at_startup": built_intents.members,
+    }
+
+
+def cache_report(client):
+    counts = {
+        "guilds": len(client.guilds),
+        "channels": sum(len(guild.channels) for guild in client.guilds),
+        "members": sum(len(guild.members) for guild in client.guilds),
+        "users": len(client.users),
+        "messages": len(client.cached_messages),
+    }
+    approx_bytes = sum(APPROX_BYTES[name] * count for name, count in counts.items())
+    return counts, approx_bytes
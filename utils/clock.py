@@ -0,0 +1,12 @@
+import datetime
+import pytz
+
+ADELAIDE_TZ = pytz.timezone("Australia/Adelaide")
+
+
+def seconds_until_midnight(tz=None):
+    now = datetime.datetime.now(tz)
+    midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time())
+    if tz is not None:
+        midnight = tz.localize(midnight)
+    return max((midnight - now).total_seconds(), 0)
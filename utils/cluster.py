@@ -0,0 +1,50 @@
+import asyncio
+import time
+
+from utils.logs import get_logger
+
+log = get_logger(__name__)
+
+
+class ChangeFeed:
+    # Replays writes made by the other cluster processes into this process's cogs
+    def __init__(self, client, interval=1.0, retention=3600):
+        self.client = client
+        self.interval = interval
+        self.retention = retention
+        self.task = None
+        self.applied = 0
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+
+    async def run(self):
+        storage = self.client.storage
+        seq = await asyncio.to_thread(storage.last_change)
+        last_pruned = time.time()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                changes = await asyncio.to_thread(storage.changes_since, seq)
+                if changes:
+                    seq = changes[-1][0]
+                    # Several writes to the same row only need one reload
+                    for kind, guild_id, user_id in dict.fromkeys(change[1:] for change in changes):
+                        await self.dispatch(kind, guild_id, user_id)
+
+                if time.time() - last_pruned > self.retention:
+                    last_pruned = time.time()
+                    await asyncio.to_thread(storage.prune_changes, last_pruned - self.retention)
+            except Exception:
+                log.exception("Error replaying cluster changes")
+
+    async def dispatch(self, kind, guild_id, user_id):
+        for cog in list(self.client.cogs.values()):
+            apply_remote_change = getattr(cog, "apply_remote_change", None)
+            if apply_remote_change:
+                await apply_remote_change(kind, guild_id, user_id)
+                self.applied += 1
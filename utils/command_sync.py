@@ -0,0 +1,31 @@
+import hashlib
+import json
+import time
+
+from utils.logs import get_logger
+from utils.storage import JSONStorage
+
+log = get_logger(__name__)
+
+
+def command_tree_hash(tree, guild=None):
+    payload = [command.to_dict(tree) for command in tree.get_commands(guild=guild)]
+    payload.sort(key=lambda command: (command.get("type", 1), command["name"]))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+async def sync_command_tree(tree, hash_file, guild=None, force=False):
+    # Bulk overwrites are heavily rate limited, so only sync a scope when its serialized commands changed
+    scope = str(guild.id) if guild else "global"
+    hashes = JSONStorage.read(hash_file)
+    digest = command_tree_hash(tree, guild)
+    if not force and hashes.get(scope) == digest:
+        log.info("Commands for %s unchanged, skipping sync", scope)
+        return None
+
+    started = time.perf_counter()
+    synced = await tree.sync(guild=guild)
+    log.info("Synced %d commands for %s in %.2fs", len(synced), scope, time.perf_counter() - started)
+    hashes[scope] = digest
+    JSONStorage.write_atomic(hash_file, hashes)
+    return synced
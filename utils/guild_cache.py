@@ -0,0 +1,73 @@
+import asyncio
+import collections
+
+
+class GuildCache:
+    # Per-guild shards loaded on first use and evicted least-recently-used first once their approximate size
+    # passes the budget. Shards reported as pinned (e.g. with unflushed writes) are never evicted.
+    def __init__(self, loader, budget, pinned=None):
+        self.loader = loader
+        self.budget = budget
+        self.pinned = pinned or (lambda guild_id: False)
+        self.shards = collections.OrderedDict()
+        self.sizes = {}
+        self.used = 0
+        self.loading = {}
+        self.stats = {"hits": 0, "misses": 0, "loads": 0, "evictions": 0}
+
+    def __len__(self):
+        return len(self.shards)
+
+    def peek(self, guild_id):
+        # Doesn't load or count as a use, for work that only matters if the guild is already in memory
+        return self.shards.get(guild_id)
+
+    def values(self):
+        return list(self.shards.values())
+
+    async def get(self, guild_id):
+        shard = self.shards.get(guild_id)
+        if shard is not None:
+            self.stats["hits"] += 1
+            self.shards.move_to_end(guild_id)
+            return shard
+
+        self.stats["misses"] += 1
+        if guild_id not in self.loading:
+            self.stats["loads"] += 1
+            task = asyncio.create_task(self.loader(guild_id))
+            self.loading[guild_id] = task
+            task.add_done_callback(lambda _: self.loading.pop(guild_id, None))
+        # Shielded so one cancelled caller doesn't cancel the load for everyone waiting on it
+        shard = await asyncio.shield(self.loading[guild_id])
+        if guild_id in self.shards:
+            return self.shards[guild_id]
+        self.put(guild_id, shard)
+        return shard
+
+    def put(self, guild_id, shard):
+        self.shards[guild_id] = shard
+        self.shards.move_to_end(guild_id)
+        self.resize(guild_id)
+
+    def resize(self, guild_id):
+        shard = self.shards.get(guild_id)
+        if shard is None:
+            return
+        size = shard.approx_size()
+        self.used += size - self.sizes.get(guild_id, 0)
+        self.sizes[guild_id] = size
+        self.evict()
+
+    def evict(self):
+        if self.used <= self.budget:
+            return
+        # The most recently used shard always stays, since its caller is about to use it
+        for guild_id in list(self.shards)[:-1]:
+            if self.used <= self.budget:
+                break
+            if self.pinned(guild_id):
+                continue
+            del self.shards[guild_id]
+            self.used -= self.sizes.pop(guild_id)
+            self.stats["evictions"] += 1
@@ -0,0 +1,132 @@
+import asyncio
+import time
+
+import discord
+from discord import app_commands
+
+from utils.logs import get_logger, interaction_logger
+from utils.metrics import metrics
+
+log = get_logger(__name__)
+
+# Discord drops an interaction that hasn't been acknowledged within 3 seconds of being created
+RESPONSE_DEADLINE = 3.0
+# Acks later than this made it, but with less headroom than a slow HTTP round trip needs
+NEAR_MISS_AFTER = RESPONSE_DEADLINE * 0.8
+# The error code Discord answers with once an interaction's token has expired
+UNKNOWN_INTERACTION = 10062
+
+
+class TrackedResponse(discord.InteractionResponse):
+    # Times the first acknowledgement however the handler responds. Once the tree has deferred on the handler's
+    # behalf, its own send_message goes out as the followup that replaces the "thinking..." message
+    def __init__(self, parent, command, started):
+        super().__init__(parent)
+        self.command = command
+        self.started = started
+        # Held while acknowledging, so the handler and the auto-defer never both send a callback
+        self.lock = asyncio.Lock()
+        self.auto_deferred = False
+        self.deferred_ephemeral = True
+        self.expired = False
+
+    async def acknowledge(self, response):
+        try:
+            result = await response
+        except discord.NotFound as error:
+            if error.code == UNKNOWN_INTERACTION:
+                self.expired = True
+                metrics.inc("command_expired_total", command=self.command)
+            raise
+        elapsed = time.perf_counter() - self.started
+        metrics.observe("command_ack_seconds", elapsed, command=self.command)
+        if elapsed > NEAR_MISS_AFTER:
+            metrics.inc("command_near_misses_total", command=self.command)
+        return result
+
+    async def auto_defer(self, ephemeral):
+        async with self.lock:
+            if self.is_done():
+                return
+            try:
+                await self.acknowledge(super().defer(ephemeral=ephemeral, thinking=True))
+            except discord.HTTPException as error:
+                interaction_logger(log, self._parent).warning("Couldn't defer /%s: %s", self.command, error)
+                return
+            self.auto_deferred = True
+            self.deferred_ephemeral = ephemeral
+        metrics.inc("command_auto_defers_total", command=self.command)
+        interaction_logger(log, self._parent).info("Deferred /%s after %.2fs", self.command,
+                                                   time.perf_counter() - self.started)
+
+    async def defer(self, *args, **kwargs):
+        async with self.lock:
+            if self.auto_deferred:
+                return None
+            return await self.acknowledge(super().defer(*args, **kwargs))
+
+    async def send_message(self, *args, **kwargs):
+        async with self.lock:
+            if not self.auto_deferred:
+                return await self.acknowledge(super().send_message(*args, **kwargs))
+        return await self.send_followup(*args, **kwargs)
+
+    async def send_followup(self, content=None, *, ephemeral=False, delete_after=None, **kwargs):
+        if ephemeral != self.deferred_ephemeral:
+            # The first followup takes over the "thinking..." message along with its visibility, so that message is
+            # removed and the response sent as a new one instead
+            await self._parent.delete_original_response()
+        message = await self._parent.followup.send(content, ephemeral=ephemeral, wait=True, **kwargs)
+        if delete_after is not None:
+            await message.delete(delay=delete_after)
+        return message
+
+    async def edit_message(self, *args, **kwargs):
+        async with self.lock:
+            return await self.acknowledge(super().edit_message(*args, **kwargs))
+
+    async def send_modal(self, *args, **kwargs):
+        async with self.lock:
+            return await self.acknowledge(super().send_modal(*args, **kwargs))
+
+    def finish(self):
+        # A handler that returns without acknowledging leaves the user with "The application did not respond"
+        if not self.is_done() and not self.expired:
+            metrics.inc("command_expired_total", command=self.command)
+
+
+class InteractionTree(app_commands.CommandTree):
+    # Slash commands are timed, and deferred for the handler once `defer_after` passes without a response, so slow
+    # work (a Tenor fetch, a cold guild load) shows "thinking..." instead of failing the 3 second deadline. Commands
+    # opt out with extras={"auto_defer": False} (a modal can't follow a defer) and those that answer publicly set
+    # extras={"defer_ephemeral": False}.
+    defer_after = 2.0
+
+    async def _call(self, interaction):
+        if interaction.type is not discord.InteractionType.application_command:
+            return await super()._call(interaction)
+
+        name = interaction.data.get("name", "unknown")
+        started = time.perf_counter()
+        response = interaction._cs_response = TrackedResponse(interaction, name, started)
+        extras = getattr(interaction.command, "extras", {})
+        deferrer = None
+        if extras.get("auto_defer", True):
+            # The deadline runs from when Discord created the interaction, and under load the event loop may only get
+            # to it well after that
+            waited = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+            delay = max(self.defer_after - waited, 0)
+            deferrer = asyncio.create_task(self.defer_late(response, delay, extras.get("defer_ephemeral", True)))
+        try:
+            await super()._call(interaction)
+        finally:
+            if deferrer:
+                deferrer.cancel()
+            response.finish()
+            metrics.observe("command_seconds", time.perf_counter() - started, command=name)
+            if interaction.command_failed:
+                metrics.inc("command_failures_total", command=name)
+
+    async def defer_late(self, response, delay, ephemeral):
+        await asyncio.sleep(delay)
+        await response.auto_defer(ephemeral)
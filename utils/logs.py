@@ -0,0 +1,98 @@
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+
+# Attributes every LogRecord has, so anything else on a record came from a contextual logger or `extra`
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class ContextFormatter(logging.Formatter):
+    # Console lines keep the old print output readable, with any context appended
+    def formatMessage(self, record):
+        line = super().formatMessage(record)
+        context = " ".join(f"{key}={value}" for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES)
+        return f"{line} [{context}]" if context else line
+
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Tracebacks are rendered here, but the JSON is built on the listener thread
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        return record
+
+
+class ContextLogger(logging.LoggerAdapter):
+    # Merges its context into each record, alongside any `extra` given to the call
+    def process(self, msg, kwargs):
+        kwargs["extra"] = {**self.extra, **kwargs.get("extra", {})}
+        return msg, kwargs
+
+    def bind(self, **context):
+        return ContextLogger(self.logger, {**self.extra, **context})
+
+
+def get_logger(name, **context):
+    return ContextLogger(logging.getLogger(name), context)
+
+
+def interaction_logger(logger, interaction):
+    context = {"guild_id": interaction.guild_id, "user_id": interaction.user.id}
+    if interaction.command:
+        context["command"] = interaction.command.qualified_name
+    if interaction.data and "id" in interaction.data:
+        context["command_id"] = interaction.data["id"]
+    return logger.bind(**context) if isinstance(logger, ContextLogger) else ContextLogger(logger, context)
+
+
+def parse_levels(levels):
+    # e.g. "discord=WARNING,cogs.random_gif=DEBUG"
+    parsed = {}
+    for item in filter(None, (item.strip() for item in levels.split(","))):
+        name, _, level = item.partition("=")
+        parsed[name.strip()] = level.strip().upper()
+    return parsed
+
+
+def setup_logging(path="duckmin.log", level="INFO", module_levels="", max_bytes=10 * 1024 * 1024, backup_count=5):
+    # Handlers only run on the listener thread, so logging never blocks the event loop on disk writes
+    file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                        encoding="utf-8")
+    file_handler.setFormatter(JSONFormatter())
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(ContextFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(LogQueueHandler(log_queue))
+    root.setLevel(level.upper())
+    for name, module_level in parse_levels(module_levels).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,186 @@
+import asyncio
+import bisect
+import collections
+import contextlib
+import re
+import time
+
+from aiohttp import web
+
+# Seconds; fine enough at the low end to tell a cached response from one that waited on HTTP
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        # Interpolated inside the bucket holding the q-th observation, like Prometheus' histogram_quantile
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+
+class Metrics:
+    prefix = "duckmin"
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = collections.Counter()
+        self.gauges = {}
+        self.collectors = []
+
+    @staticmethod
+    def key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, name, seconds, **labels):
+        key = self.key(name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def inc(self, name, amount=1, **labels):
+        self.counters[self.key(name, labels)] += amount
+
+    def set(self, name, value, **labels):
+        self.gauges[self.key(name, labels)] = value
+
+    def add_collector(self, collector):
+        # Called at scrape time; yields (name, labels, value) gauges, for stats that components already keep
+        self.collectors.append(collector)
+
+    def histograms_named(self, name):
+        return [(dict(labels), histogram) for (key, labels), histogram in self.histograms.items() if key == name]
+
+    def counter_total(self, name):
+        return sum(value for (key, _), value in self.counters.items() if key == name)
+
+    def reset(self):
+        self.histograms.clear()
+        self.counters.clear()
+        self.gauges.clear()
+
+    def collect(self):
+        gauges = dict(self.gauges)
+        for collector in self.collectors:
+            for name, labels, value in collector():
+                gauges[self.key(name, labels)] = value
+        return gauges
+
+    def render(self):
+        lines = []
+        for kind, samples in (("counter", self.counters.items()), ("gauge", self.collect().items())):
+            seen = set()
+            for (name, labels), value in sorted(samples, key=lambda sample: sample[0]):
+                metric = self.metric_name(name)
+                if metric not in seen:
+                    seen.add(metric)
+                    lines.append(f"# TYPE {metric} {kind}")
+                lines.append(f"{metric}{self.format_labels(labels)} {float(value)}")
+
+        seen = set()
+        for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+            metric = self.metric_name(name)
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip([*histogram.buckets, "+Inf"], histogram.counts):
+                cumulative += count
+                lines.append(f"{metric}_bucket{self.format_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{metric}_sum{self.format_labels(labels)} {histogram.sum}")
+            lines.append(f"{metric}_count{self.format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def metric_name(self, name):
+        return f"{self.prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}"
+
+    @staticmethod
+    def format_labels(labels):
+        if not labels:
+            return ""
+        escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+metrics = Metrics()
+
+
+def stats_gauges(component, stats, **labels):
+    # Flattens a component's stats dict into gauges, skipping anything that isn't a number
+    for key, value in stats.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f"{component}_{key}", labels, value
+
+
+class LoopLagMonitor:
+    # A task that should wake every `interval`; anything past that is time the loop spent busy elsewhere
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+
+    async def run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            metrics.observe("event_loop_lag_seconds", lag)
+            metrics.set("event_loop_lag_last_seconds", lag)
+
+
+class MetricsServer:
+    def __init__(self, host="127.0.0.1", port=9108):
+        self.host = host
+        self.port = port
+        self.runner = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+
+    async def close(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+    async def handle(self, request):
+        return web.Response(text=metrics.render(), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
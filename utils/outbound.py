@@ -0,0 +1,195 @@
+import asyncio
+import collections
+import heapq
+import random
+import time
+
+import discord
+
+from utils.metrics import metrics
+
+# Route kinds that Discord doesn't count towards the global rate limit: interaction responses and webhooks
+# (which is how followups and edits to interaction responses are sent)
+GLOBAL_EXEMPT = ("interaction", "webhook")
+
+
+class TokenBucket:
+    def __init__(self, rate, per):
+        self.rate = rate
+        self.per = per
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate / self.per)
+        self.updated = now
+
+    def delay(self):
+        self.refill()
+        return 0 if self.tokens >= 1 else (1 - self.tokens) * self.per / self.rate
+
+    def take(self):
+        self.refill()
+        self.tokens -= 1
+
+    def full_at(self):
+        return self.updated + (self.rate - self.tokens) * self.per / self.rate
+
+
+class OutboundJob:
+    __slots__ = ("factory", "future", "enqueued", "coalesce_key", "idempotent")
+
+    def __init__(self, factory, future, coalesce_key, idempotent):
+        self.factory = factory
+        self.future = future
+        self.enqueued = time.perf_counter()
+        self.coalesce_key = coalesce_key
+        self.idempotent = idempotent
+
+
+class OutboundDispatcher:
+    def __init__(self, global_rate=50, global_per=1.0, route_rate=5, route_per=5.0, max_retries=4, base_backoff=0.5):
+        self.global_bucket = TokenBucket(global_rate, global_per)
+        self.route_rate = route_rate
+        self.route_per = route_per
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.queues = {}
+        self.buckets = {}
+        self.workers = {}
+        self.coalescing = {}
+        # (full_at, route) for routes whose worker finished before their bucket refilled
+        self.idle_buckets = []
+        self.counters = {
+            "queued": 0,
+            "sent": 0,
+            "coalesced": 0,
+            "retries": 0,
+            "failures": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+        }
+
+    @property
+    def queue_depth(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+    def stats(self):
+        return {**self.counters, "queue_depth": self.queue_depth, "routes": len(self.queues)}
+
+    def submit(self, route, factory, coalesce_key=None, idempotent=False):
+        # A queued job with the same coalesce key has not started yet, so it can just send the newer payload
+        if coalesce_key is not None and coalesce_key in self.coalescing:
+            job = self.coalescing[coalesce_key]
+            job.factory = factory
+            self.counters["coalesced"] += 1
+            return job.future
+
+        self.prune_buckets()
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        job = OutboundJob(factory, future, coalesce_key, idempotent)
+        self.queues.setdefault(route, collections.deque()).append(job)
+        if coalesce_key is not None:
+            self.coalescing[coalesce_key] = job
+        self.counters["queued"] += 1
+
+        if route not in self.workers:
+            self.workers[route] = asyncio.create_task(self.run_route(route))
+        return future
+
+    async def send(self, route, factory, coalesce_key=None, idempotent=False):
+        return await self.submit(route, factory, coalesce_key, idempotent)
+
+    async def run_route(self, route):
+        queue = self.queues[route]
+        bucket = self.buckets.setdefault(route, TokenBucket(self.route_rate, self.route_per))
+        # So slash command replies don't queue behind a burst of DMs
+        exempt = route.split(":", 1)[0] in GLOBAL_EXEMPT
+        try:
+            while queue:
+                await self.wait_for(bucket, exempt)
+                job = queue.popleft()
+                if job.coalesce_key is not None:
+                    self.coalescing.pop(job.coalesce_key, None)
+
+                waited = (time.perf_counter() - job.enqueued) * 1000
+                self.counters["total_wait_ms"] += waited
+                self.counters["max_wait_ms"] = max(self.counters["max_wait_ms"], waited)
+                metrics.observe("outbound_queue_wait_seconds", waited / 1000)
+                await self.run_job(job, route)
+        finally:
+            del self.workers[route]
+            if not queue:
+                del self.queues[route]
+                bucket.refill()
+                if bucket.tokens >= bucket.rate:
+                    del self.buckets[route]
+                else:
+                    heapq.heappush(self.idle_buckets, (bucket.full_at(), route))
+
+    def prune_buckets(self):
+        # A full bucket is the same as a new one, so it can go once its route has nothing queued
+        now = time.monotonic()
+        while self.idle_buckets and self.idle_buckets[0][0] <= now:
+            _, route = heapq.heappop(self.idle_buckets)
+            bucket = self.buckets.get(route)
+            # A route used again since is pushed back when its worker finishes
+            if bucket is not None and route not in self.workers:
+                bucket.refill()
+                if bucket.tokens >= bucket.rate:
+                    del self.buckets[route]
+
+    async def wait_for(self, bucket, exempt=False):
+        while True:
+            delay = max(bucket.delay(), 0 if exempt else self.global_bucket.delay())
+            if delay == 0:
+                bucket.take()
+                if not exempt:
+                    self.global_bucket.take()
+                return
+            await asyncio.sleep(delay)
+
+    async def run_job(self, job, route):
+        if job.future.done():
+            return
+        # Labelled by route kind (dm, channel, interaction, webhook) rather than the full route, to keep it small
+        kind = route.split(":", 1)[0]
+        for attempt in range(self.max_retries + 1):
+            try:
+                with metrics.timer("outbound_request_seconds", route=kind):
+                    result = await job.factory()
+            except discord.HTTPException as err:
+                # discord.py already waits out 429s itself. A 5xx may have been applied before it failed, so only
+                # calls that are safe to repeat (edits) are retried, a send could post the message twice
+                if attempt == self.max_retries or not (job.idempotent and err.status >= 500):
+                    self.counters["failures"] += 1
+                    self.resolve(job, error=err)
+                    return
+                self.counters["retries"] += 1
+                await asyncio.sleep(self.base_backoff * 2 ** attempt * random.uniform(1, 1.5))
+            except Exception as err:
+                self.counters["failures"] += 1
+                self.resolve(job, error=err)
+                return
+            else:
+                self.counters["sent"] += 1
+                self.resolve(job, result=result)
+                return
+
+    @staticmethod
+    def resolve(job, result=None, error=None):
+        if job.future.done():
+            return
+        if error is not None:
+            job.future.set_exception(error)
+        else:
+            job.future.set_result(result)
+
+    async def close(self):
+        for worker in list(self.workers.values()):
+            worker.cancel()
+        for queue in self.queues.values():
+            for job in queue:
+                job.future.cancel()
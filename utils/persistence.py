@@ -0,0 +1,121 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.logs import get_logger
+from utils.metrics import metrics
+
+log = get_logger(__name__)
+
+
+class WriteBehind:
+    def __init__(self, storage, delay=0.5):
+        self.storage = storage
+        self.delay = delay
+        self.pending = {}
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="persistence")
+        self.flush_task = None
+        self.counters = {
+            "mutations": 0,
+            "coalesced": 0,
+            "flushes": 0,
+            "writes": 0,
+            "errors": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+
+    @property
+    def queue_depth(self):
+        return len(self.pending)
+
+    def is_pending(self, key):
+        return key in self.pending
+
+    def is_guild_pending(self, guild_id):
+        return any(key[0] in ("appreciation", "saved_appreciations") and key[1] == guild_id for key in self.pending)
+
+    def pending_task_ids(self, user_id):
+        return {key[2] for key in self.pending if key[0] == "task" and key[1] == user_id}
+
+    async def read(self, method, *args):
+        # Reads share the write thread, so they see every write taken off the queue before them
+        return await asyncio.get_running_loop().run_in_executor(self.executor, method, *args)
+
+    def stats(self):
+        return {**self.counters, "queue_depth": self.queue_depth}
+
+    def mark_dirty(self, key, method, *args):
+        self.counters["mutations"] += 1
+        # Re-inserting moves the key to the end so the batch keeps the order of the latest mutations
+        if self.pending.pop(key, None) is not None:
+            self.counters["coalesced"] += 1
+        self.pending[key] = (method, args)
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.storage.apply([op for _, op in self.take_pending()])
+            return
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = loop.create_task(self.run())
+
+    def set_appreciation(self, guild_id, user_id, entry):
+        self.mark_dirty(("appreciation", guild_id, user_id), "set_appreciation", guild_id, user_id, dict(entry))
+
+    def purge_appreciations(self, today):
+        self.mark_dirty(("purge_appreciations",), "purge_appreciations", today)
+
+    def set_saved_appreciations(self, guild_id, user_id, saved_list):
+        self.mark_dirty(("saved_appreciations", guild_id, user_id), "set_saved_appreciations", guild_id, user_id,
+                        list(saved_list or []))
+
+    def set_task(self, user_id, task):
+        self.mark_dirty(("task", user_id, task["id"]), "set_task", user_id, dict(task))
+
+    def delete_task(self, user_id, task_id):
+        self.mark_dirty(("task", user_id, task_id), "delete_task", user_id, task_id)
+
+    def set_last_reminded(self, user_id, timestamp):
+        self.mark_dirty(("last_reminded", user_id), "set_last_reminded", user_id, timestamp)
+
+    def take_pending(self):
+        items = list(self.pending.items())
+        self.pending = {}
+        return items
+
+    async def run(self):
+        while self.pending:
+            await asyncio.sleep(self.delay)
+            await self.flush()
+
+    async def flush(self):
+        if not self.pending:
+            return
+        items = self.take_pending()
+        ops = [op for _, op in items]
+        started = time.perf_counter()
+        try:
+            # Shielded so a cancelled flush still lands on disk
+            await asyncio.shield(asyncio.get_running_loop().run_in_executor(self.executor, self.storage.apply, ops))
+        except asyncio.CancelledError:
+            raise
+        except Exception as err:
+            self.counters["errors"] += 1
+            log.warning("Error flushing %d writes, retrying: %s", len(ops), err)
+            self.pending = {**dict(items), **self.pending}
+            return
+        elapsed = (time.perf_counter() - started) * 1000
+        metrics.observe("persistence_flush_seconds", elapsed / 1000)
+        self.counters["flushes"] += 1
+        self.counters["writes"] += len(ops)
+        self.counters["last_flush_ms"] = elapsed
+        self.counters["max_flush_ms"] = max(self.counters["max_flush_ms"], elapsed)
+        self.counters["total_flush_ms"] += elapsed
+
+    async def drain(self):
+        if self.flush_task and not self.flush_task.done():
+            self.flush_task.cancel()
+        await self.flush()
+        self.executor.shutdown(wait=True)
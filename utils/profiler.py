@@ -0,0 +1,180 @@
+import asyncio
+import collections
+import contextlib
+import contextvars
+import datetime
+import os
+import sys
+import threading
+import time
+
+from utils.logs import get_logger
+
+log = get_logger(__name__)
+
+# Set inside the task running an event handler, so the callbacks that task schedules can be attributed to it
+current_listener = contextvars.ContextVar("current_listener", default=None)
+# Leaf frames that mean the loop was waiting for something to happen rather than busy
+IDLE_FRAMES = ("selectors:EpollSelector.select", "selectors:KqueueSelector.select", "selectors:SelectSelector.select",
+               "selectors:PollSelector.select", "selectors:DevpollSelector.select")
+
+
+def callable_name(obj):
+    # Never repr() what the loop is running: reprs can read state that isn't set up yet (aiohttp's
+    # ClientResponse caches its headers on first access, so reading them early breaks the response)
+    name = getattr(obj, "__qualname__", None)
+    if name is None:
+        func = getattr(obj, "func", None)  # functools.partial
+        name = getattr(func, "__qualname__", None) or type(obj).__qualname__
+    return name
+
+
+class Timing:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+
+class Profiler:
+    # A time-boxed profile of the event loop. A thread samples the loop thread's stack every `interval` into
+    # collapsed stacks (flamegraph.pl/speedscope format), and every callback the loop runs is timed. Nothing is
+    # installed while no profile is running, so the only cost when off is the `active` check in Client._run_event.
+    def __init__(self, directory="profiles", interval=0.005):
+        self.directory = directory
+        self.interval = interval
+        self.active = False
+        self.thread_id = None
+        self.sampler = None
+        self.stacks = collections.Counter()
+        self.callbacks = collections.defaultdict(Timing)
+        self.listeners = collections.defaultdict(Timing)
+        self.listener_busy = collections.defaultdict(float)
+        self.original_run = None
+        self.original_switch_interval = None
+        self.started = None
+
+    async def profile(self, seconds, top=10):
+        # Returns the path of the collapsed stack dump and a top-N summary
+        if self.active:
+            raise RuntimeError("A profile is already running")
+        self.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            elapsed = self.stop()
+        path = await asyncio.to_thread(self.dump)
+        summary = self.summary(elapsed, top)
+        log.info("Profiled the event loop for %.1fs, stacks written to %s\n%s", elapsed, path, summary)
+        return path, summary
+
+    def start(self):
+        self.stacks.clear()
+        self.callbacks.clear()
+        self.listeners.clear()
+        self.listener_busy.clear()
+        self.thread_id = threading.get_ident()
+        self.started = time.perf_counter()
+        self.active = True
+        self.original_run = asyncio.Handle._run
+        profiler = self
+
+        def timed_run(handle):
+            started = time.perf_counter()
+            try:
+                return profiler.original_run(handle)
+            finally:
+                profiler.record_callback(handle, time.perf_counter() - started)
+
+        asyncio.Handle._run = timed_run
+        # The sampler only gets the GIL once the loop thread's switch interval passes, so bursts of work shorter
+        # than that would never be sampled and every sample would land in select()
+        self.original_switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self.original_switch_interval, self.interval / 10))
+        self.sampler = threading.Thread(target=self.sample, name="profiler", daemon=True)
+        self.sampler.start()
+
+    def stop(self):
+        self.active = False
+        asyncio.Handle._run = self.original_run
+        sys.setswitchinterval(self.original_switch_interval)
+        self.sampler.join()
+        return time.perf_counter() - self.started
+
+    def sample(self):
+        while self.active:
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+    def record_callback(self, handle, seconds):
+        callback = handle._callback
+        task = getattr(callback, "__self__", None)
+        # Read after the callback ran, since a handler's first step is the one that sets its name
+        listener = handle._context.get(current_listener)
+        if listener is not None:
+            name = f"listener {listener}"
+            self.listener_busy[listener] += seconds
+        elif isinstance(task, asyncio.Task):
+            name = f"task {callable_name(task.get_coro())}"
+        else:
+            name = callable_name(callback)
+        self.callbacks[name].add(seconds)
+
+    @contextlib.contextmanager
+    def listener(self, handler):
+        name = callable_name(handler)
+        current_listener.set(name)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.listeners[name].add(time.perf_counter() - started)
+
+    def dump(self):
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"profile-{datetime.datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}.collapsed"
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+    def summary(self, elapsed, top=10):
+        samples = sum(self.stacks.values())
+        idle = sum(count for stack, count in self.stacks.items() if stack.rsplit(";", 1)[-1] in IDLE_FRAMES)
+        busy = sum(timing.total for timing in self.callbacks.values())
+        lines = [f"{elapsed:.1f}s, {samples} samples, loop busy {busy / elapsed:.0%} "
+                 f"({idle / samples if samples else 0:.0%} of samples idle)",
+                 "", "Slowest callbacks (max, total, calls):"]
+        for name, timing in sorted(self.callbacks.items(), key=lambda item: -item[1].max)[:top]:
+            lines.append(f"  {timing.max * 1000:8.1f}ms {timing.total * 1000:9.1f}ms {timing.count:7}  {name}")
+
+        lines += ["", "Listeners (avg, max, busy on the loop, calls):"]
+        for name, timing in sorted(self.listeners.items(), key=lambda item: -item[1].total)[:top]:
+            lines.append(f"  {timing.total / timing.count * 1000:8.2f}ms {timing.max * 1000:8.1f}ms "
+                         f"{self.listener_busy[name] * 1000:9.1f}ms {timing.count:7}  {name}")
+
+        leaves = collections.Counter()
+        for stack, count in self.stacks.items():
+            leaf = stack.rsplit(";", 1)[-1]
+            if leaf not in IDLE_FRAMES:
+                leaves[leaf] += count
+        lines += ["", "Hottest functions (share of samples):"]
+        for leaf, count in leaves.most_common(top):
+            lines.append(f"  {count / samples:6.1%}  {leaf}")
+        return "\n".join(lines)
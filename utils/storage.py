@@ -0,0 +1,484 @@
+import contextlib
+import copy
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from utils.logs import get_logger
+
+log = get_logger(__name__)
+
+
+def numbered_tasks(user_tasks):
+    # Tasks saved before they had IDs are numbered by their position, like the cog does when loading them
+    return {data.get("id", i): data for i, data in enumerate(user_tasks, 1)}
+
+
+def first_unused_task_id(tasks):
+    # Where the task ID counter starts for data saved before it was stored
+    return 1 + max((task_id for user_tasks in tasks.values() for task_id in numbered_tasks(user_tasks)), default=0)
+
+
+def task_rows(user_id, user_tasks):
+    return [(user_id, task_id, data["task"], data["due_date"], data.get("ignored_until"))
+            for task_id, data in numbered_tasks(user_tasks).items()]
+
+
+class Storage:
+    def apply(self, ops):
+        for method, args in ops:
+            getattr(self, method)(*args)
+
+    def load_appreciations(self):
+        raise NotImplementedError
+
+    def load_saved_appreciations(self):
+        raise NotImplementedError
+
+    def load_tasks(self):
+        raise NotImplementedError
+
+    def load_guild_appreciations(self, guild_id, date):
+        raise NotImplementedError
+
+    def load_guild_saved_appreciations(self, guild_id):
+        raise NotImplementedError
+
+    def set_appreciation(self, guild_id, user_id, entry):
+        raise NotImplementedError
+
+    def purge_appreciations(self, today):
+        raise NotImplementedError
+
+    def set_saved_appreciations(self, guild_id, user_id, saved_list):
+        raise NotImplementedError
+
+    def set_task(self, user_id, task):
+        raise NotImplementedError
+
+    def delete_task(self, user_id, task_id):
+        raise NotImplementedError
+
+    def load_last_reminded(self):
+        raise NotImplementedError
+
+    def set_last_reminded(self, user_id, timestamp):
+        raise NotImplementedError
+
+    def reserve_task_ids(self, count):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class JSONStorage(Storage):
+    def __init__(self, appreciations_file="appreciations.json", saved_appreciations_file="saved_appreciations.json",
+                 tasks_file="tasks.json", reminders_file="reminders.json", meta_file="meta.json"):
+        self.appreciations_file = appreciations_file
+        self.saved_appreciations_file = saved_appreciations_file
+        self.tasks_file = tasks_file
+        self.reminders_file = reminders_file
+        self.meta_file = meta_file
+        self.appreciations = None
+        self.saved_appreciations = None
+        self.tasks = None
+        self.last_reminded = None
+        self.dirty_files = None
+
+    @staticmethod
+    def read(path):
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    @staticmethod
+    def write_atomic(path, data):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp_path)
+            raise
+
+    def write(self, path, data):
+        if self.dirty_files is not None:
+            self.dirty_files[path] = data
+        else:
+            self.write_atomic(path, data)
+
+    def apply(self, ops):
+        # Apply the whole batch in memory, then snapshot each touched file once
+        self.dirty_files = {}
+        try:
+            super().apply(ops)
+            dirty_files = self.dirty_files
+        finally:
+            self.dirty_files = None
+        for path, data in dirty_files.items():
+            self.write_atomic(path, data)
+
+    def has_data(self):
+        return any(os.path.exists(path) for path in
+                   (self.appreciations_file, self.saved_appreciations_file, self.tasks_file))
+
+    # The cogs get their own copies so snapshots can be serialized off the event loop
+    def load_appreciations(self):
+        self.appreciations = self.read(self.appreciations_file)
+        return copy.deepcopy(self.appreciations)
+
+    def load_saved_appreciations(self):
+        self.saved_appreciations = self.read(self.saved_appreciations_file)
+        return copy.deepcopy(self.saved_appreciations)
+
+    def load_tasks(self):
+        self.tasks = self.read(self.tasks_file)
+        return copy.deepcopy(self.tasks)
+
+    def load_guild_appreciations(self, guild_id, date):
+        if self.appreciations is None:
+            self.load_appreciations()
+        entries = [(user_id, entry) for user_id, entry in self.appreciations.get(guild_id, {}).items()
+                   if entry["date"] == date]
+        entries.sort(key=lambda item: item[1].get("shared_at", 0))
+        return {user_id: dict(entry) for user_id, entry in entries}
+
+    def load_guild_saved_appreciations(self, guild_id):
+        if self.saved_appreciations is None:
+            self.load_saved_appreciations()
+        return copy.deepcopy(self.saved_appreciations.get(guild_id, {}))
+
+    def set_appreciation(self, guild_id, user_id, entry):
+        if self.appreciations is None:
+            self.load_appreciations()
+        self.appreciations.setdefault(guild_id, {})[user_id] = entry
+        self.write(self.appreciations_file, self.appreciations)
+
+    def purge_appreciations(self, today):
+        if self.appreciations is None:
+            self.load_appreciations()
+        for guild_id in self.appreciations:
+            self.appreciations[guild_id] = {k: v for k, v in self.appreciations[guild_id].items() if v["date"] == today}
+        self.write(self.appreciations_file, self.appreciations)
+
+    def set_saved_appreciations(self, guild_id, user_id, saved_list):
+        if self.saved_appreciations is None:
+            self.load_saved_appreciations()
+        if saved_list:
+            self.saved_appreciations.setdefault(guild_id, {})[user_id] = saved_list
+        else:
+            self.saved_appreciations.get(guild_id, {}).pop(user_id, None)
+        self.write(self.saved_appreciations_file, self.saved_appreciations)
+
+    def user_tasks(self, user_id):
+        if self.tasks is None:
+            self.load_tasks()
+        return numbered_tasks(self.tasks.get(user_id, []))
+
+    def store_user_tasks(self, user_id, user_tasks):
+        if user_tasks:
+            self.tasks[user_id] = [{**data, "id": task_id} for task_id, data in user_tasks.items()]
+        else:
+            self.tasks.pop(user_id, None)
+        self.write(self.tasks_file, self.tasks)
+
+    def set_task(self, user_id, task):
+        user_tasks = self.user_tasks(user_id)
+        user_tasks[task["id"]] = task
+        self.store_user_tasks(user_id, user_tasks)
+
+    def delete_task(self, user_id, task_id):
+        user_tasks = self.user_tasks(user_id)
+        user_tasks.pop(task_id, None)
+        self.store_user_tasks(user_id, user_tasks)
+
+    def load_last_reminded(self):
+        self.last_reminded = self.read(self.reminders_file)
+        return dict(self.last_reminded)
+
+    def set_last_reminded(self, user_id, timestamp):
+        if self.last_reminded is None:
+            self.load_last_reminded()
+        self.last_reminded[user_id] = timestamp
+        self.write(self.reminders_file, self.last_reminded)
+
+    def reserve_task_ids(self, count):
+        # Written straight away, since the IDs are handed out before the tasks using them are saved
+        meta = self.read(self.meta_file)
+        first = meta.get("next_task_id") or first_unused_task_id(self.read(self.tasks_file))
+        meta["next_task_id"] = first + count
+        self.write_atomic(self.meta_file, meta)
+        return first
+
+
+class SQLiteStorage(Storage):
+    schema = """
+        CREATE TABLE IF NOT EXISTS appreciations (
+            guild_id TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            appreciation TEXT NOT NULL,
+            shared_at REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, user_id)
+        );
+        CREATE INDEX IF NOT EXISTS appreciations_date ON appreciations (date);
+        CREATE TABLE IF NOT EXISTS saved_appreciations (
+            guild_id TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            appreciations TEXT NOT NULL,
+            PRIMARY KEY (guild_id, user_id)
+        );
+        CREATE TABLE IF NOT EXISTS task_items (
+            user_id TEXT NOT NULL,
+            id INTEGER NOT NULL,
+            task TEXT NOT NULL,
+            due_date TEXT NOT NULL,
+            ignored_until INTEGER,
+            PRIMARY KEY (user_id, id)
+        );
+        CREATE TABLE IF NOT EXISTS reminders (
+            user_id TEXT PRIMARY KEY,
+            last_reminded REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO meta VALUES ('next_task_id', 1);
+        CREATE TABLE IF NOT EXISTS changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            origin TEXT NOT NULL,
+            created REAL NOT NULL,
+            kind TEXT NOT NULL,
+            guild_id TEXT,
+            user_id TEXT
+        );
+    """
+
+    def __init__(self, path="duckmin.db", origin=None):
+        self.path = path
+        # Set when several processes share the database, so each can replay the others' writes
+        self.origin = origin
+        self.is_new = not os.path.exists(path)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.batching = False
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("PRAGMA busy_timeout=5000")
+        self.db.executescript(self.schema)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        with self.lock:
+            if self.batching:
+                yield self.db
+            else:
+                with self.db:
+                    yield self.db
+
+    def apply(self, ops):
+        with self.lock, self.db:
+            self.batching = True
+            try:
+                super().apply(ops)
+            finally:
+                self.batching = False
+
+    def load_appreciations(self):
+        appreciations = {}
+        with self.lock:
+            rows = self.db.execute("SELECT guild_id, user_id, date, appreciation, shared_at FROM appreciations "
+                                   "ORDER BY shared_at, rowid").fetchall()
+        for guild_id, user_id, date, appreciation, shared_at in rows:
+            appreciations.setdefault(guild_id, {})[user_id] = {"date": date, "appreciation": appreciation,
+                                                                "shared_at": shared_at}
+        return appreciations
+
+    def load_saved_appreciations(self):
+        saved_appreciations = {}
+        with self.lock:
+            rows = self.db.execute("SELECT guild_id, user_id, appreciations FROM saved_appreciations").fetchall()
+        for guild_id, user_id, saved_list in rows:
+            saved_appreciations.setdefault(guild_id, {})[user_id] = json.loads(saved_list)
+        return saved_appreciations
+
+    @staticmethod
+    def task_entry(task_id, task, due_date, ignored_until):
+        return {"id": task_id, "task": task, "due_date": due_date, "ignored_until": ignored_until}
+
+    def load_tasks(self):
+        tasks = {}
+        with self.lock:
+            rows = self.db.execute("SELECT user_id, id, task, due_date, ignored_until FROM task_items").fetchall()
+        for user_id, *task in rows:
+            tasks.setdefault(user_id, []).append(self.task_entry(*task))
+        return tasks
+
+    def load_last_reminded(self):
+        with self.lock:
+            return dict(self.db.execute("SELECT user_id, last_reminded FROM reminders").fetchall())
+
+    def load_guild_appreciations(self, guild_id, date):
+        with self.lock:
+            # In the order they were first shared, which is the order the cog browses them in
+            rows = self.db.execute("SELECT user_id, appreciation, shared_at FROM appreciations "
+                                   "WHERE guild_id = ? AND date = ? ORDER BY shared_at, rowid",
+                                   (guild_id, date)).fetchall()
+        return {user_id: {"date": date, "appreciation": appreciation, "shared_at": shared_at}
+                for user_id, appreciation, shared_at in rows}
+
+    def load_guild_saved_appreciations(self, guild_id):
+        with self.lock:
+            rows = self.db.execute("SELECT user_id, appreciations FROM saved_appreciations WHERE guild_id = ?",
+                                   (guild_id,)).fetchall()
+        return {user_id: json.loads(saved_list) for user_id, saved_list in rows}
+
+    def get_appreciation(self, guild_id, user_id):
+        with self.lock:
+            row = self.db.execute("SELECT date, appreciation, shared_at FROM appreciations "
+                                  "WHERE guild_id = ? AND user_id = ?", (guild_id, user_id)).fetchone()
+        return {"date": row[0], "appreciation": row[1], "shared_at": row[2]} if row else None
+
+    def get_saved_appreciations(self, guild_id, user_id):
+        with self.lock:
+            row = self.db.execute("SELECT appreciations FROM saved_appreciations WHERE guild_id = ? AND user_id = ?",
+                                  (guild_id, user_id)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_tasks(self, user_id):
+        with self.lock:
+            rows = self.db.execute("SELECT id, task, due_date, ignored_until FROM task_items WHERE user_id = ?",
+                                   (user_id,)).fetchall()
+        return [self.task_entry(*row) for row in rows]
+
+    def record_change(self, db, kind, guild_id=None, user_id=None):
+        if self.origin is not None:
+            db.execute("INSERT INTO changes (origin, created, kind, guild_id, user_id) VALUES (?, ?, ?, ?, ?)",
+                       (self.origin, time.time(), kind, guild_id, user_id))
+
+    def last_change(self):
+        with self.lock:
+            return self.db.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def changes_since(self, seq):
+        with self.lock:
+            return self.db.execute("SELECT seq, kind, guild_id, user_id FROM changes WHERE seq > ? AND origin != ? "
+                                   "ORDER BY seq", (seq, self.origin)).fetchall()
+
+    def prune_changes(self, before):
+        with self.transaction() as db:
+            db.execute("DELETE FROM changes WHERE created < ?", (before,))
+
+    def set_appreciation(self, guild_id, user_id, entry):
+        with self.transaction() as db:
+            db.execute("INSERT INTO appreciations VALUES (?, ?, ?, ?, ?) ON CONFLICT (guild_id, user_id) DO UPDATE "
+                       "SET date = excluded.date, appreciation = excluded.appreciation, shared_at = excluded.shared_at",
+                       (guild_id, user_id, entry["date"], entry["appreciation"], entry.get("shared_at", 0)))
+            self.record_change(db, "appreciation", guild_id, user_id)
+
+    def purge_appreciations(self, today):
+        with self.transaction() as db:
+            db.execute("DELETE FROM appreciations WHERE date != ?", (today,))
+
+    def set_saved_appreciations(self, guild_id, user_id, saved_list):
+        with self.transaction() as db:
+            if saved_list:
+                db.execute("INSERT OR REPLACE INTO saved_appreciations VALUES (?, ?, ?)",
+                           (guild_id, user_id, json.dumps(saved_list)))
+            else:
+                db.execute("DELETE FROM saved_appreciations WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
+            self.record_change(db, "saved_appreciations", guild_id, user_id)
+
+    def set_task(self, user_id, task):
+        with self.transaction() as db:
+            db.execute("INSERT OR REPLACE INTO task_items VALUES (?, ?, ?, ?, ?)",
+                       (user_id, task["id"], task["task"], task["due_date"], task.get("ignored_until")))
+            self.record_change(db, "tasks", user_id=user_id)
+
+    def delete_task(self, user_id, task_id):
+        with self.transaction() as db:
+            db.execute("DELETE FROM task_items WHERE user_id = ? AND id = ?", (user_id, task_id))
+            self.record_change(db, "tasks", user_id=user_id)
+
+    def set_last_reminded(self, user_id, timestamp):
+        # Only the primary process sends reminders, so the other processes don't need to hear about this
+        with self.transaction() as db:
+            db.execute("INSERT OR REPLACE INTO reminders VALUES (?, ?)", (user_id, timestamp))
+
+    def reserve_task_ids(self, count):
+        # Every process sharing the database takes its IDs from this one counter
+        with self.transaction() as db:
+            return db.execute("UPDATE meta SET value = value + ? WHERE key = 'next_task_id' RETURNING value - ?",
+                              (count, count)).fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def migrate_json_to_sqlite(json_storage, sqlite_storage):
+    appreciations = json_storage.load_appreciations()
+    saved_appreciations = json_storage.load_saved_appreciations()
+    tasks = json_storage.load_tasks()
+
+    with sqlite_storage.db as db:
+        db.executemany("INSERT OR REPLACE INTO appreciations VALUES (?, ?, ?, ?, ?)", [
+            (guild_id, user_id, entry["date"], entry["appreciation"], entry.get("shared_at", 0))
+            for guild_id, users in appreciations.items() for user_id, entry in users.items()
+        ])
+        db.executemany("INSERT OR REPLACE INTO saved_appreciations VALUES (?, ?, ?)", [
+            (guild_id, user_id, json.dumps(saved_list))
+            for guild_id, users in saved_appreciations.items() for user_id, saved_list in users.items() if saved_list
+        ])
+        db.executemany("INSERT OR REPLACE INTO task_items VALUES (?, ?, ?, ?, ?)", [
+            row for user_id, user_tasks in tasks.items() for row in task_rows(user_id, user_tasks)
+        ])
+        next_task_id = max(first_unused_task_id(tasks),
+                           json_storage.read(json_storage.meta_file).get("next_task_id", 0))
+        db.execute("UPDATE meta SET value = MAX(value, ?) WHERE key = 'next_task_id'", (next_task_id,))
+
+    return sum(len(users) for users in appreciations.values()), \
+        sum(len(users) for users in saved_appreciations.values()), len(tasks)
+
+
+def open_storage(backend="sqlite", path="duckmin.db", origin=None):
+    json_storage = JSONStorage()
+    if backend == "json":
+        if origin is not None:
+            raise ValueError("Cluster mode needs the sqlite storage backend")
+        return json_storage
+    if backend != "sqlite":
+        raise ValueError(f"Unknown storage backend: {backend}")
+
+    sqlite_storage = SQLiteStorage(path, origin)
+    if sqlite_storage.is_new and json_storage.has_data():
+        counts = migrate_json_to_sqlite(json_storage, sqlite_storage)
+        log.info("Migrated %d appreciations, %d saved appreciation lists and %d task lists to %s", *counts, path)
+    return sqlite_storage
+
+
+# Imports the JSON files in the current directory into duckmin.db. Run it from the repository root as a module,
+# `python -m utils.storage [--force]`, so the utils package can be imported
+if __name__ == "__main__":
+    storage = SQLiteStorage()
+    # The JSON files are only a starting point: an existing database may already hold newer data
+    if not storage.is_new and "--force" not in sys.argv:
+        storage.close()
+        sys.exit(f"{storage.path} already exists, so the JSON files may be older than it. "
+                 f"Pass --force to overwrite its rows with them anyway.")
+    counts = migrate_json_to_sqlite(JSONStorage(), storage)
+    storage.close()
+    print("Migrated {} appreciations, {} saved appreciation lists and {} task lists to {}".format(*counts,
+                                                                                               storage.path))
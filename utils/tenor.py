@@ -0,0 +1,149 @@
+import asyncio
+import time
+
+import aiohttp
+
+from utils.logs import get_logger
+from utils.metrics import metrics
+
+log = get_logger(__name__)
+
+# Params left out of the single-flight key. Callers pick a random page offset, which would otherwise keep
+# concurrent requests for the same term from ever sharing a fetch; they all get the first caller's page instead
+UNKEYED_PARAMS = ("pos",)
+
+
+class TenorUnavailable(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        state = self.state
+        if state == "closed":
+            return True
+        # Once the reset timeout passes, a single trial request decides whether to close again
+        if state == "half-open" and not self.trial_running:
+            self.trial_running = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.trial_running or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self.trial_running = False
+
+
+class TenorClient:
+    def __init__(self, api_key, client_key, base_url="https://tenor.googleapis.com/v2", timeout=2.0,
+                 connect_timeout=1.0, connection_limit=20, dns_cache_ttl=300, keepalive_timeout=60):
+        self.api_key = api_key
+        self.client_key = client_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = aiohttp.ClientTimeout(total=timeout, sock_connect=connect_timeout)
+        self.connection_limit = connection_limit
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.session = None
+        self.breaker = CircuitBreaker()
+        self.in_flight = {}
+        self.last_good = {}
+        self.stats = {"requests": 0, "coalesced": 0, "errors": 0, "fallbacks": 0, "short_circuited": 0,
+                      "total_request_ms": 0.0}
+
+    async def start(self):
+        connector = aiohttp.TCPConnector(limit=self.connection_limit, ttl_dns_cache=self.dns_cache_ttl,
+                                         keepalive_timeout=self.keepalive_timeout)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
+
+    async def get(self, endpoint, parse, **params):
+        key = (endpoint, tuple(sorted(item for item in params.items() if item[0] not in UNKEYED_PARAMS)))
+        if key in self.in_flight:
+            self.stats["coalesced"] += 1
+        else:
+            task = asyncio.create_task(self.fetch(endpoint, parse, params))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        # Shielded so one cancelled caller doesn't cancel the request for everyone sharing it
+        return await asyncio.shield(self.in_flight[key])
+
+    async def fetch(self, endpoint, parse, params):
+        # Degraded responses fall back to the last good result for the same endpoint and search term
+        fallback_key = (endpoint, params.get("q"))
+        if not self.breaker.allow():
+            self.stats["short_circuited"] += 1
+            return self.fallback(fallback_key)
+
+        self.stats["requests"] += 1
+        started = time.perf_counter()
+        query = {**params, "key": self.api_key, "client_key": self.client_key}
+        succeeded = False
+        try:
+            async with self.session.get(f"{self.base_url}/{endpoint}", params=query) as response:
+                if response.status != 200:
+                    raise TenorUnavailable(f"Tenor returned {response.status}: {await response.text()}")
+                # Parsed here so a malformed body counts against the breaker and falls back like any other failure
+                data = parse(await response.json())
+            succeeded = True
+        except (aiohttp.ClientError, asyncio.TimeoutError, TenorUnavailable, ValueError, KeyError, TypeError) as err:
+            self.stats["errors"] += 1
+            log.warning("Error fetching %s from Tenor: %r", endpoint, err)
+            return self.fallback(fallback_key)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.stats["total_request_ms"] += elapsed * 1000
+            metrics.observe("tenor_request_seconds", elapsed, endpoint=endpoint)
+            # Any other way out (a bad JSON body, cancellation) counts as a failure too, otherwise a half-open
+            # breaker would wait on a trial that never reports back
+            if succeeded:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+
+        self.last_good[fallback_key] = data
+        return data
+
+    def fallback(self, key):
+        if key not in self.last_good:
+            raise TenorUnavailable(f"No cached {key[0]} results for {key[1]!r}")
+        self.stats["fallbacks"] += 1
+        return self.last_good[key]
+
+    @staticmethod
+    def parse_suggestions(data):
+        return list(data["results"])
+
+    @staticmethod
+    def parse_search(data):
+        return [result["media_formats"]["gif"]["url"] for result in data["results"]]
+
+    async def search_suggestions(self, term):
+        return await self.get("search_suggestions", self.parse_suggestions, q=term)
+
+    async def search(self, term, limit=50, pos=0):
+        return await self.get("search", self.parse_search, q=term, limit=limit, pos=pos)